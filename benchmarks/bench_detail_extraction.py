@@ -0,0 +1,154 @@
+"""Compare the legacy per-field detail extraction with the single-evaluate schema extraction.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_detail_extraction [--iterations 50] [--fixture benchmarks/fixtures/detail.html]
+
+Both variants run against the same saved detail page loaded with page.set_content, so the numbers
+only contain extraction cost (IPC round-trips to Chromium), not navigation.
+"""
+import argparse
+import asyncio
+import inspect
+import re
+import statistics
+import time
+from pathlib import Path
+
+import orjson
+from playwright.async_api import async_playwright
+
+from libs.websites import kleinanzeigen as lib
+from scrapers.inserat import build_inserat_details
+
+FIXTURE = Path(__file__).parent / "fixtures" / "detail.html"
+URL = "https://www.kleinanzeigen.de/s-anzeige/trekkingrad/2901234567"
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+
+    def wrap(self, target):
+        if isinstance(target, list):
+            return [self.wrap(item) for item in target]
+        if target is None or isinstance(target, (str, bool, int, float, dict)):
+            return target
+        return _CountingProxy(target, self)
+
+
+class _CountingProxy:
+    def __init__(self, target, counter: RoundTripCounter):
+        self._target = target
+        self._counter = counter
+
+    def __bool__(self):
+        return True
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def counted(*args, **kwargs):
+            self._counter.count += 1
+            return self._counter.wrap(await attr(*args, **kwargs))
+
+        return counted
+
+
+async def legacy_extract(page, url: str) -> dict:
+    # Stand vor der Schema-Extraktion: ein Roundtrip pro Feld bzw. pro Element
+    ad_id = await lib.get_element_content(page, "#viewad-ad-id-box > ul > li:nth-child(2)", default="")
+    if not ad_id:
+        match = re.search(r'/(\d+)$', url)
+        ad_id = match.group(1) if match else "[ERROR] Ad ID not found"
+    categories = [cat.strip() for cat in await lib.get_elements_content(page, ".breadcrump-link") if cat.strip()]
+    title = await lib.get_element_content(page, "#viewad-title, .vap-title", default="[ERROR] Title not found")
+    price = lib.parse_price(await lib.get_element_content(page, "#viewad-price, .vap-price"))
+    views = await lib.get_element_content(page, "#viewad-cntr-num")
+    description = await lib.get_element_content(page, "#viewad-description-text, .vap-description")
+    if description:
+        description = re.sub(r'[ \t]+', ' ', description).strip()
+        description = re.sub(r'\n+', '\n', description)
+
+    async def details():
+        return await lib.get_details(page) if await page.query_selector("#viewad-details") else {}
+
+    async def features():
+        return await lib.get_features(page) if await page.query_selector("#viewad-configuration") else {}
+
+    async def shipping():
+        return bool(await lib.get_element_content(page, ".boxedarticle--details--shipping"))
+
+    images, seller, details, features, shipping, location, extra_info = await asyncio.gather(
+        lib.get_image_sources(page, "#viewad-image"),
+        lib.get_seller_details(page),
+        details(),
+        features(),
+        shipping(),
+        lib.get_location(page),
+        lib.get_extra_info(page),
+    )
+    return {
+        "id": ad_id,
+        "categories": categories,
+        "title": title.split(" • ")[-1].strip() if " • " in title else title.strip(),
+        "price": price,
+        "shipping": shipping,
+        "location": location,
+        "views": views if views else "0",
+        "description": description,
+        "images": images,
+        "details": details,
+        "features": features,
+        "seller": seller,
+        "extra_info": extra_info,
+    }
+
+
+async def schema_extract(page, url: str) -> dict:
+    return build_inserat_details(await lib.extract_record(page, lib.DETAIL_SCHEMA), url)
+
+
+async def measure(page, extractor, iterations: int):
+    counter = RoundTripCounter()
+    result = await extractor(counter.wrap(page), URL)
+    round_trips = counter.count
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await extractor(page, URL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, round_trips, timings
+
+
+async def main(iterations: int, fixture: Path):
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(fixture.read_text(encoding="utf-8"))
+
+        legacy_result, legacy_trips, legacy_times = await measure(page, legacy_extract, iterations)
+        schema_result, schema_trips, schema_times = await measure(page, schema_extract, iterations)
+        await browser.close()
+
+    # Vergleich auf JSON-Ebene: die Schema-Variante liefert ein Detail-Record, die alte ein dict
+    legacy_result, schema_result = orjson.loads(orjson.dumps(legacy_result)), orjson.loads(orjson.dumps(schema_result))
+    print(f"{'variant':<10} {'round-trips':>12} {'p50 ms':>10} {'mean ms':>10}")
+    for name, trips, times in (("legacy", legacy_trips, legacy_times), ("schema", schema_trips, schema_times)):
+        print(f"{name:<10} {trips:>12} {statistics.median(times):>10.2f} {statistics.mean(times):>10.2f}")
+    print("output identical:", legacy_result == schema_result)
+    if legacy_result != schema_result:
+        for key in legacy_result:
+            if legacy_result[key] != schema_result.get(key):
+                print(f"  {key}: {legacy_result[key]!r} != {schema_result.get(key)!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--fixture", type=Path, default=FIXTURE)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.fixture))
@@ -0,0 +1,75 @@
+"""Time /inserate/stats aggregation over large result sets: NumPy columns vs. a plain Python loop.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_market_stats [--ads 500,10000,100000] [--repeat 5]
+
+Listings come from the saved search page with varied prices and postal codes, once as records (live
+scrape) and once as plain dicts (as read from the SQLite cache). The Python variant computes the same
+median, quantiles and postal code medians with the statistics module for comparison.
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import replace
+from pathlib import Path
+
+import orjson
+
+from libs.websites import kleinanzeigen as lib
+from libs.websites.models import parse_number
+from utils.market_stats import AdColumns, market_stats
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def build_listings(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    listings = lib.parse_ads_html((FIXTURES / "search.html").read_text(encoding="utf-8"))
+    return [replace(listings[i % len(listings)], adid=str(i), price=str(rng.randint(1, 5000)), _price_value=None,
+                    location=f"{rng.randint(10000, 99999)} Ort") for i in range(count)]
+
+
+def python_stats(ads) -> dict:
+    prices, by_zip = [], defaultdict(list)
+    for ad in ads:
+        value = parse_number(ad["price"])
+        prices.append(value)
+        by_zip[ad["location"][:2]].append(value)
+    return {
+        "median": statistics.median(prices),
+        "quantiles": statistics.quantiles(prices, n=20),
+        "by_zip": {key: statistics.median(values) for key, values in by_zip.items()},
+    }
+
+
+def measure(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(counts, repeat: int):
+    print(f"{'ads':>8} {'variant':<16} {'p50 ms':>9}")
+    for count in counts:
+        records = build_listings(count)
+        dicts = orjson.loads(orjson.dumps(records))
+        columns = AdColumns(records)
+        for name, function in (("python", lambda: python_stats(dicts)),
+                               ("numpy records", lambda: market_stats(records)),
+                               ("numpy dicts", lambda: market_stats(dicts)),
+                               ("numpy columns", lambda: market_stats(columns))):
+            print(f"{count:>8} {name:<16} {measure(function, repeat):>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ads", default="500,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main([int(count) for count in args.ads.split(",")], args.repeat)
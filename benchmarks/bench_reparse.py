@@ -0,0 +1,54 @@
+"""Offline re-parse throughput over a snapshot store, per number of worker processes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reparse [--pages 2000] [--workers 0,1,2,4]
+
+Fills a temporary snapshot store with copies of the saved detail and search pages (each copy made
+unique so it is stored as its own object) and reports pages/sec of scrapers.reparse per worker count;
+0 parses in the benchmark process itself. Process startup is included in the timings.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from scrapers.reparse import ReparseSummary, reparse
+from utils.snapshot_store import SnapshotStore
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def fill_store(store: SnapshotStore, pages: int):
+    detail = (FIXTURES / "detail.html").read_text(encoding="utf-8")
+    search = (FIXTURES / "search.html").read_text(encoding="utf-8")
+    for i in range(pages):
+        # Jede vierte Seite eine Suchseite, wie bei Suchen mit anschließendem Detailabruf
+        kind, html = ("search", search) if i % 4 == 0 else ("detail", detail)
+        store.put(kind, f"https://www.kleinanzeigen.de/s-anzeige/x/{2900000000 + i}", f"{html}<!-- {i} -->")
+
+
+def main(pages: int, worker_counts):
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(directory)
+        started = time.perf_counter()
+        fill_store(store, pages)
+        print(f"stored {pages} pages in {time.perf_counter() - started:.2f}s, "
+              f"{sum(f.stat().st_size for f in Path(directory, 'objects').rglob('*.gz')) / 1024:.0f} KiB on disk")
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'failed':>7}")
+        for workers in worker_counts:
+            summary = ReparseSummary()
+            started = time.perf_counter()
+            for result in reparse(store, workers=workers):
+                summary.add(result)
+            seconds = time.perf_counter() - started
+            print(f"{workers:>8} {seconds:>9.2f} {pages / seconds:>9.0f} {sum(summary.failed.values()):>7}")
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--workers", default="0,1,2,4")
+    args = parser.parse_args()
+    main(args.pages, [int(count) for count in args.workers.split(",")])
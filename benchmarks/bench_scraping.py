@@ -0,0 +1,238 @@
+"""Throughput and latency of the API against the local stand-in server, without touching kleinanzeigen.de.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_scraping [--workloads search,detail] [--concurrency 1,4,16]
+        [--engines browser,http] [--pools 1x4,2x4] [--variants normal,slow,errors]
+        [--requests 50] [--page-count 1] [--output results.json] [--compare previous.json]
+
+Every scenario runs in its own process so pool and engine settings (read from the environment at
+import time) apply cleanly. Requests go through the ASGI app in-process; caching and the host rate
+limit are disabled so each request really scrapes. Peak memory covers the worker process including
+its Chromium children.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.standin import StandInServer
+
+RESULTS_DIR = Path(__file__).parent / "results"
+VARIANTS = {
+    "normal": {"delay": 0.0, "jitter": 0.0, "error_rate": 0.0, "challenge_rate": 0.0, "not_found_rate": 0.0},
+    "slow": {"delay": 0.3, "jitter": 0.2, "error_rate": 0.0, "challenge_rate": 0.0, "not_found_rate": 0.0},
+    "errors": {"delay": 0.0, "jitter": 0.0, "error_rate": 0.1, "challenge_rate": 0.05, "not_found_rate": 0.05},
+}
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def run_worker(scenario: dict) -> dict:
+    import httpx
+
+    import main
+    from utils.memory_governor import process_tree_rss
+
+    app = main.app
+    peak_rss = 0
+    sampling = True
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while sampling:
+            peak_rss = max(peak_rss, process_tree_rss(os.getpid()) or 0)
+            await asyncio.sleep(0.1)
+
+    def request_path(i: int) -> str:
+        # Eindeutige Parameter, damit Singleflight keine Anfragen zusammenlegt
+        if scenario["workload"] == "detail":
+            return f"/inserat/{2901240000 + i}"
+        return f"/inserate?query=fahrrad+{i}&page_count={scenario['page_count']}"
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    async with app.router.lifespan_context(app):
+        sampler = asyncio.create_task(sample_memory())
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            await client.get(request_path(-1))  # Aufwärmen
+
+            semaphore = asyncio.Semaphore(scenario["concurrency"])
+
+            async def one(i: int):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.get(request_path(i))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    statuses[response.status_code] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(scenario["requests"])))
+            elapsed = time.perf_counter() - started
+        pool_stats = app.state.browser_pool.stats()
+        sampling = False
+        await sampler
+
+    return {
+        **scenario,
+        "ok": statuses.get(200, 0),
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(scenario["requests"] / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "max": round(max(latencies), 1),
+        },
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+        "python_maxrss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "acquire_timeouts": pool_stats["acquire_timeouts"],
+    }
+
+
+def scenarios(args) -> List[dict]:
+    result = []
+    for workload, variant, pool, concurrency in itertools.product(
+            args.workloads, args.variants, args.pools, args.concurrency):
+        # Die Detailseiten werden immer mit Playwright geladen
+        engines = args.engines if workload == "search" else ["browser"]
+        for engine in engines:
+            size, pages = (int(part) for part in pool.split("x"))
+            result.append({
+                "name": f"{workload}/{engine}/{variant}/pool={pool}/c={concurrency}",
+                "workload": workload,
+                "engine": engine,
+                "variant": variant,
+                "pool_size": size,
+                "pool_pages": pages,
+                "concurrency": concurrency,
+                "requests": args.requests,
+                "page_count": args.page_count,
+            })
+    return result
+
+
+def run_scenario(server: StandInServer, scenario: dict, data_dir: str) -> dict:
+    server.configure(**VARIANTS[scenario["variant"]])
+    upstream_before = server.requests
+    env = {
+        **os.environ,
+        "KLEINANZEIGEN_BASE_URL": server.base_url,
+        "SEARCH_ENGINE": scenario["engine"],
+        "BROWSER_POOL_SIZE": str(scenario["pool_size"]),
+        "BROWSER_POOL_PAGES": str(scenario["pool_pages"]),
+        "BROWSER_ACQUIRE_TIMEOUT": "300",
+        "BROWSER_MAX_WAITING": str(scenario["requests"] + 1),
+        "HOST_RATE_LIMIT": "0",
+        "CACHE_BACKEND": "memory",
+        "CACHE_TTL_SEARCH": "0",
+        "CACHE_TTL_DETAIL": "0",
+        "DATA_DIR": data_dir,
+    }
+    process = subprocess.run([sys.executable, "-m", "benchmarks.bench_scraping", "--worker", json.dumps(scenario)],
+                             env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        # Letzte Exception-Zeile des Tracebacks, nicht die Dekoration von Playwright-Fehlermeldungen
+        lines = process.stderr.strip().splitlines() or ["failed"]
+        errors = [line for line in lines if re.match(r"^[\w.]+(Error|Exception)\b", line)]
+        return {**scenario, "error": (errors or lines)[-1]}
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["upstream_requests"] = server.requests - upstream_before
+    return result
+
+
+def print_table(results: List[dict], previous: Dict[str, dict]):
+    header = f"{'scenario':<48} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'peak MB':>8} {'ok':>5}"
+    if previous:
+        header += f" {'Δrps':>8} {'Δp95':>8}"
+    print(header)
+    for result in results:
+        if "error" in result:
+            print(f"{result['name']:<48} failed: {result['error']}")
+            continue
+        latency = result["latency_ms"]
+        line = (f"{result['name']:<48} {result['rps']:>8.2f} {latency['p50']:>8.1f} {latency['p95']:>8.1f} "
+                f"{latency['p99']:>8.1f} {result['peak_rss_mb']:>8.1f} {result['ok']:>5}")
+        before = previous.get(result["name"])
+        if before and "error" not in before:
+            line += (f" {(result['rps'] / before['rps'] - 1) * 100:>+7.1f}%"
+                     f" {(latency['p95'] / before['latency_ms']['p95'] - 1) * 100:>+7.1f}%")
+        print(line)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main(args):
+    previous = {}
+    if args.compare:
+        previous = {result["name"]: result for result in json.loads(args.compare.read_text())["scenarios"]}
+
+    server = StandInServer(search_pages=max(args.page_count, 5)).start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            for scenario in scenarios(args):
+                print(f"running {scenario['name']} ...", file=sys.stderr)
+                results.append(run_scenario(server, scenario, data_dir))
+    finally:
+        server.close()
+
+    print_table(results, previous)
+    output = args.output or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "scenarios": results,
+    }, indent=2))
+    print(f"results written to {output}")
+
+
+def _csv(cast=str):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", type=_csv(), default=["search", "detail"])
+    parser.add_argument("--engines", type=_csv(), default=["browser", "http"])
+    parser.add_argument("--pools", type=_csv(), default=["1x4"], help="browsers x pages, e.g. 1x4,2x4")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 4, 16])
+    parser.add_argument("--variants", type=_csv(), default=["normal"], help=",".join(VARIANTS))
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--page-count", type=int, default=1, help="page_count of search requests")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_worker(json.loads(args.worker)))))
+    else:
+        main(args)
@@ -0,0 +1,95 @@
+"""Compare response encoding of plain dicts (jsonable_encoder + json.dumps) with slots records + orjson.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization [--ads 25,500,5000] [--repeat 20]
+
+Listings come from the saved search page, details are built from a representative detail record and
+copied up to the requested count. Reports encode time and peak allocation (tracemalloc) per payload.
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from libs.websites import kleinanzeigen as lib
+from scrapers.inserat import build_inserat_details
+
+FIXTURES = Path(__file__).parent / "fixtures"
+DETAIL_RECORD = {
+    "ad_id": "2901234567",
+    "title": "Trekkingrad 28 Zoll",
+    "price": "1.250 € VB",
+    "views": "312",
+    "location": "10178 Berlin - Mitte",
+    "categories": ["Fahrräder & Zubehör", "Herren"],
+    "description": "Trekkingrad in gutem Zustand, regelmäßig gewartet. " * 6,
+    "images": [f"https://img.kleinanzeigen.de/api/v1/prod-ads/images/{i}.jpg" for i in range(8)],
+    "has_details": True,
+    "details": [{"content": "Art Herren", "value": "Herren"}, {"content": "Typ Trekkingrad", "value": "Trekkingrad"}],
+    "has_features": True,
+    "features": ["Licht", "Gepäckträger"],
+    "seller_name": "Max",
+    "seller_type": "Privater Nutzer",
+    "seller_since": "Aktiv seit 01.01.2020",
+    "seller_badges": ["Sehr freundlich", "Zuverlässig"],
+    "created_at": "14.10.2026",
+}
+
+
+def build_payloads(count: int):
+    listings = lib.parse_ads_html((FIXTURES / "search.html").read_text(encoding="utf-8"))
+    listings = [replace(listings[i % len(listings)], adid=str(i)) for i in range(count)]
+    detail = build_inserat_details(DETAIL_RECORD, "https://www.kleinanzeigen.de/s-anzeige/trekkingrad/2901234567")
+    details = [replace(detail, id=str(i)) for i in range(count)]
+    return {"listings": listings, "details": details}
+
+
+def encode_legacy(records) -> bytes:
+    # Stand vorher: dicts, von FastAPI durch jsonable_encoder geschickt und mit json.dumps kodiert
+    return json.dumps(jsonable_encoder({"success": True, "data": records}), ensure_ascii=False).encode()
+
+
+def encode_orjson(records) -> bytes:
+    return orjson.dumps({"success": True, "data": records})
+
+
+def measure(encode, payload, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    body = encode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return body, statistics.median(timings), peak
+
+
+def main(counts, repeat: int):
+    print(f"{'payload':<10} {'ads':>6} {'variant':<8} {'p50 ms':>9} {'peak KiB':>10} {'bytes':>10}")
+    for count in counts:
+        for kind, records in build_payloads(count).items():
+            dicts = [record.to_dict() for record in records]
+            legacy_body, legacy_ms, legacy_peak = measure(encode_legacy, dicts, repeat)
+            new_body, new_ms, new_peak = measure(encode_orjson, records, repeat)
+            for name, ms, peak, body in (("legacy", legacy_ms, legacy_peak, legacy_body),
+                                         ("orjson", new_ms, new_peak, new_body)):
+                print(f"{kind:<10} {count:>6} {name:<8} {ms:>9.2f} {peak / 1024:>10.1f} {len(body):>10}")
+            if json.loads(legacy_body) != json.loads(new_body):
+                print(f"  {kind}: output differs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ads", default="25,500,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main([int(count) for count in args.ads.split(",")], args.repeat)
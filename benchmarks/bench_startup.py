@@ -0,0 +1,158 @@
+"""Cold-start timings of the API per BROWSER_STARTUP mode, against the local stand-in server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--modes eager,background,lazy] [--runs 3]
+        [--first-request /inserat/2901234567] [--output results.json]
+
+Every run boots a fresh uvicorn process and measures, from process start: the first byte served
+(GET /), the first scrape response (--first-request, sent right after the first byte, like a user
+request waking up a scaled-to-zero instance) and the moment GET /ready reports a warm browser pool.
+The import time of main.py is measured separately.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.bench_scraping import RESULTS_DIR, git_revision
+from benchmarks.standin import StandInServer
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, url: str, started: float, timeout: float, status: int = 200) -> Optional[float]:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(url).status_code == status:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_import(env: dict) -> float:
+    process = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True,
+                             check=True)
+    return float(process.stdout.strip().splitlines()[-1])
+
+
+def run_once(env: dict, first_request: str, timeout: float) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    result = {"first_byte": None, "first_request": None, "first_request_status": None, "ready": None}
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            result["first_byte"] = wait_for(client, f"{base}/", started, timeout)
+            if result["first_byte"] is None:
+                raise RuntimeError("server did not answer")
+            response = client.get(f"{base}{first_request}")
+            result["first_request"] = time.perf_counter() - started
+            result["first_request_status"] = response.status_code
+            result["ready"] = wait_for(client, f"{base}/ready", started, timeout)
+    except Exception as e:
+        process.terminate()
+        stderr = process.communicate(timeout=30)[1].strip().splitlines()
+        result["error"] = stderr[-1] if stderr else str(e)
+        return result
+    process.terminate()
+    process.wait(timeout=30)
+    return result
+
+
+def summarize(mode: str, import_seconds: List[float], runs: List[dict]) -> dict:
+    def median(key: str) -> Optional[float]:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    return {
+        "mode": mode,
+        "import_seconds": round(statistics.median(import_seconds), 3),
+        "first_byte": median("first_byte"),
+        "first_request": median("first_request"),
+        "first_request_status": [run["first_request_status"] for run in runs],
+        "ready": median("ready"),
+        "errors": [run["error"] for run in runs if "error" in run],
+        "runs": runs,
+    }
+
+
+def print_table(results: List[dict]):
+    def cell(value: Optional[float]) -> str:
+        return f"{value:>10.3f}" if value is not None else f"{'-':>10}"
+
+    print(f"{'mode':<12} {'import s':>10} {'1st byte s':>10} {'1st req s':>10} {'ready s':>10}  status")
+    for result in results:
+        print(f"{result['mode']:<12} {cell(result['import_seconds'])} {cell(result['first_byte'])} "
+              f"{cell(result['first_request'])} {cell(result['ready'])}  {result['first_request_status']}")
+        for error in result["errors"]:
+            print(f"  error: {error}")
+
+
+def main(args):
+    server = StandInServer().start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            for mode in args.modes:
+                env = {
+                    **os.environ,
+                    "KLEINANZEIGEN_BASE_URL": server.base_url,
+                    "BROWSER_STARTUP": mode,
+                    "HOST_RATE_LIMIT": "0",
+                    "CACHE_TTL_SEARCH": "0",
+                    "CACHE_TTL_DETAIL": "0",
+                    "DATA_DIR": data_dir,
+                }
+                print(f"running {mode} ...", file=sys.stderr)
+                import_seconds, runs = [], []
+                for _ in range(args.runs):
+                    # Jeder Lauf beginnt ohne gespeicherten Sitzungszustand
+                    Path(data_dir, "session_state.json").unlink(missing_ok=True)
+                    import_seconds.append(measure_import(env))
+                    runs.append(run_once(env, args.first_request, args.timeout))
+                results.append(summarize(mode, import_seconds, runs))
+    finally:
+        server.close()
+
+    print_table(results)
+    output = args.output or RESULTS_DIR / f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "modes": results,
+    }, indent=2))
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", type=lambda value: [item for item in value.split(",") if item],
+                        default=["eager", "background", "lazy"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--first-request", default="/inserat/2901234567")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path)
+    main(parser.parse_args())
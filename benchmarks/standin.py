@@ -0,0 +1,156 @@
+"""Local stand-in for kleinanzeigen.de that serves the recorded pages in benchmarks/fixtures/.
+
+Point the API at it with KLEINANZEIGEN_BASE_URL, e.g. for manual testing:
+
+    python -m benchmarks.standin --port 8765 [--delay 0.3] [--error-rate 0.1]
+    KLEINANZEIGEN_BASE_URL=http://127.0.0.1:8765 HOST_RATE_LIMIT=0 python main.py
+
+Search pages beyond --search-pages return an empty result list, so pagination stops like on the
+real site. The ad IDs of the recorded search page are shifted per result page to keep them unique.
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SEARCH_PAGE = re.compile(r"/s-seite:(\d+)")
+AD_ID = re.compile(r'(data-adid="|/)(29012345\d\d)')
+
+
+class StandInServer:
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 fixtures: Path = FIXTURES,
+                 search_pages: int = 5,
+                 delay: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 challenge_rate: float = 0.0,
+                 not_found_rate: float = 0.0,
+                 seed: int = 1):
+        self.search_pages = search_pages
+        self.delay = delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.challenge_rate = challenge_rate
+        self.not_found_rate = not_found_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {name: (fixtures / f"{name}.html").read_text(encoding="utf-8")
+                       for name in ("search", "search_empty", "detail", "challenge", "not_found")}
+        self._search_cache = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, **settings):
+        # Varianten (langsam, fehlerhaft) zwischen zwei Szenarien umschalten
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise AttributeError(name)
+            setattr(self, name, value)
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _roll(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def _search_page(self, page_number: int) -> str:
+        if page_number > self.search_pages:
+            return self._pages["search_empty"]
+        if page_number not in self._search_cache:
+            offset = (page_number - 1) * 1000
+            self._search_cache[page_number] = AD_ID.sub(
+                lambda match: match.group(1) + str(int(match.group(2)) + offset), self._pages["search"])
+        return self._search_cache[page_number]
+
+    def respond(self, path: str):
+        with self._lock:
+            self.requests += 1
+            delay = self.delay + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if self._roll(self.error_rate):
+            return 503, self._pages["challenge"]
+        if self._roll(self.challenge_rate):
+            return 200, self._pages["challenge"]
+
+        if path.startswith(("/s-anzeige/", "/anzeigen/")):
+            if self._roll(self.not_found_rate):
+                return 404, self._pages["not_found"]
+            return 200, self._pages["detail"]
+
+        match = SEARCH_PAGE.search(path)
+        if match:
+            return 200, self._search_page(int(match.group(1)))
+        if path.startswith("/s-"):
+            # Fallback-URL der Suche (/s-{query})
+            return 200, self._search_page(1)
+        if path == "/":
+            # Startseite für die Sitzungs-Vorwärmung
+            return 200, self._pages["search_empty"]
+        return 404, self._pages["not_found"]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = server.respond(urlsplit(self.path).path)
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--search-pages", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--challenge-rate", type=float, default=0.0, help="share of bot challenge pages")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="share of 404s for detail pages")
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, search_pages=args.search_pages, delay=args.delay,
+                           jitter=args.jitter, error_rate=args.error_rate, challenge_rate=args.challenge_rate,
+                           not_found_rate=args.not_found_rate)
+    print(f"Serving fixtures on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
@@ -1,5 +1,13 @@
-from typing import Dict, List, Optional, Union, Any
-from playwright.async_api import Page, ElementHandle
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any
+from selectolax.lexbor import LexborHTMLParser, LexborNode as Node
+
+from libs.websites.models import ExtraInfo, Listing, Location, Price, Seller
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, ElementHandle
 
 
 async def get_element_content(page: Page, selector: str, default: Any = None) -> Optional[str]:
@@ -24,9 +32,9 @@ async def get_image_sources(page: Page, selector: str) -> List[str]:
     return images
 
 
-def parse_price(price_text: Optional[str]) -> Dict[str, Union[str, bool]]:
+def parse_price(price_text: Optional[str]) -> Price:
     if not price_text:
-        return {"amount": "0", "currency": "€", "negotiable": False}
+        return Price(amount="0", currency="€", negotiable=False)
 
     price_text = price_text.strip()
     negotiable: bool = "VB" in price_text
@@ -35,51 +43,50 @@ def parse_price(price_text: Optional[str]) -> Dict[str, Union[str, bool]]:
 
     amount: str = price_text.replace("€", "").replace(".", "").replace(",", ".").strip()
 
-    return {
-        "amount": amount,
-        "currency": "€",
-        "negotiable": negotiable
-    }
+    return Price(amount=amount, currency="€", negotiable=negotiable)
 
 
-async def get_seller_details(page: Page) -> Dict[str, Optional[str]]:
-    result = {
-        "name": None,
-        "since": None,
-        "type": "private",
-        "badges": []
-    }
+async def get_seller_details(page: Page) -> Seller:
+    name: Optional[str] = None
+    seller_type: Optional[str] = None
+    seller_since: Optional[str] = None
+    badges: List[str] = []
 
     try:
         # Get seller name
         name_selector = ".userprofile-vip"
-        result["name"] = await get_element_content(page, name_selector)
+        name = await get_element_content(page, name_selector)
 
         # Get seller type
         type_selector = ".userprofile-vip-details-text:has-text('Privater Nutzer'), .userprofile-vip-details-text:has-text('Gewerblicher Nutzer')"
         seller_type = await get_element_content(page, type_selector)
-        if seller_type:
-            result["type"] = "business" if "Gewerblicher" in seller_type else "private"
 
         # Get since date
         since_selector = ".userprofile-vip-details-text:has-text('Aktiv seit')"
         seller_since = await get_element_content(page, since_selector)
-        if seller_since:
-            result["since"] = seller_since.replace("Aktiv seit ", "").strip()
 
         # Get user badges
         badges_selector = ".userprofile-vip-badges .userbadge-tag"
         badges = await get_elements_content(page, badges_selector)
-        result["badges"] = [badge.strip() for badge in badges if badge and badge.strip()]
 
     except Exception as e:
         print(f"Error getting seller details: {str(e)}")
 
+    return build_seller_details(name, seller_type, seller_since, badges)
+
+
+def build_seller_details(name: Optional[str], seller_type: Optional[str], seller_since: Optional[str],
+                         badges: List[str]) -> Seller:
+    result = Seller(name=name, badges=[badge.strip() for badge in badges if badge and badge.strip()])
+    if seller_type:
+        result.type = "business" if "Gewerblicher" in seller_type else "private"
+    if seller_since:
+        result.since = seller_since.replace("Aktiv seit ", "").strip()
     return result
 
 
 async def get_details(page: Page) -> Dict[str, str]:
-    details: Dict[str, str] = {}
+    rows: List[Tuple[str, Optional[str]]] = []
     try:
         # Get all detail items
         detail_items: List[ElementHandle] = await page.query_selector_all("#viewad-details .addetailslist--detail")
@@ -89,41 +96,48 @@ async def get_details(page: Page) -> Dict[str, str]:
             content: str = await item.text_content()
             # Find the span element inside
             value_span: Optional[ElementHandle] = await item.query_selector(".addetailslist--detail--value")
-
-            if value_span:
-                value: str = await value_span.text_content()
-                # The label is the content without the value
-                label: str = content.replace(value, "").strip()
-                details[label] = value.strip()
+            rows.append((content, await value_span.text_content() if value_span else None))
     except Exception as e:
         print(f"Error getting details: {str(e)}")
 
+    return build_details(rows)
+
+
+def build_details(rows: List[Tuple[str, Optional[str]]]) -> Dict[str, str]:
+    details: Dict[str, str] = {}
+    for content, value in rows:
+        if value is not None:
+            # The label is the content without the value
+            label: str = content.replace(value, "").strip()
+            details[label] = value.strip()
     return details
 
 
 async def get_features(page: Page) -> List[str]:
-    features: List[str] = []
+    feature_texts: List[str] = []
     try:
         feature_elements: List[ElementHandle] = await page.query_selector_all(
             "#viewad-configuration .checktaglist .checktag")
         for feature in feature_elements:
-            feature_text: str = await feature.text_content()
-            if feature_text and feature_text.strip():
-                features.append(feature_text.strip())
+            feature_texts.append(await feature.text_content())
     except Exception as e:
         print(f"Error getting features: {str(e)}")
 
-    return features
+    return build_features(feature_texts)
 
 
-async def get_location(page: Page) -> Dict[str, str]:
+def build_features(feature_texts: List[Optional[str]]) -> List[str]:
+    return [feature_text.strip() for feature_text in feature_texts if feature_text and feature_text.strip()]
+
+
+async def get_location(page: Page) -> Location:
     location: Optional[str] = await get_element_content(page, "#viewad-locality")
+    return split_location(location)
+
+
+def split_location(location: Optional[str]) -> Location:
     if not location:
-        return {
-            "zip": "",
-            "city": "",
-            "state": ""
-        }
+        return Location(zip="", city="", state="")
 
     location_parts: List[str] = location.split(" - ") if " - " in location else [location]
 
@@ -134,29 +148,243 @@ async def get_location(page: Page) -> Dict[str, str]:
 
     city: str = location_parts[1].strip() if len(location_parts) > 1 else ""
 
-    return {
-        "zip": zip_code,
-        "city": city,
-        "state": state
-    }
+    return Location(zip=zip_code, city=city, state=state)
 
 
-async def get_extra_info(page: Page) -> Dict[str, Optional[str]]:
-    result: Dict[str, Optional[str]] = {
-        "created_at": None,
-        "views": "0"
-    }
+async def get_extra_info(page: Page) -> ExtraInfo:
+    result = ExtraInfo(created_at=None, views="0")
 
     try:
         date_element: Optional[ElementHandle] = await page.query_selector(
             "#viewad-extra-info > div:nth-child(1) > span")
         if date_element:
-            result["created_at"] = await date_element.inner_text()
+            result.created_at = await date_element.inner_text()
 
         views_element: Optional[ElementHandle] = await page.query_selector("#viewad-cntr-num")
         if views_element:
-            result["views"] = await views_element.inner_text()
+            result.views = await views_element.inner_text()
     except Exception as e:
         print(f"Error getting extra info: {str(e)}")
 
     return result
+
+
+
+# Declarative extraction schema for ad detail pages. Every field is a CSS selector plus what to
+# read from the match; EXTRACT_SCRIPT evaluates the whole schema in a single round-trip.
+# Fields that raised inside the browser are null and listed in the record's "_errors".
+#   text:     "innerText" (default, like ElementHandle.inner_text) or "textContent"
+#   attr:     read an attribute instead of text
+#   all:      return a list for every match instead of the first match only
+#   contains: keep only matches whose text contains one of the strings (like Playwright's :has-text)
+#   exists:   return whether the selector matches at all
+#   fields:   nested schema evaluated relative to each match; "self" reads the match itself
+DETAIL_SCHEMA: Dict[str, Dict[str, Any]] = {
+    "ad_id": {"selector": "#viewad-ad-id-box > ul > li:nth-child(2)"},
+    "categories": {"selector": ".breadcrump-link", "all": True, "text": "textContent"},
+    "title": {"selector": "#viewad-title, .vap-title"},
+    "price": {"selector": "#viewad-price, .vap-price"},
+    "views": {"selector": "#viewad-cntr-num"},
+    "description": {"selector": "#viewad-description-text, .vap-description"},
+    "images": {"selector": "#viewad-image", "attr": "src"},
+    "seller_name": {"selector": ".userprofile-vip"},
+    "seller_type": {"selector": ".userprofile-vip-details-text", "contains": ["Privater Nutzer", "Gewerblicher Nutzer"]},
+    "seller_since": {"selector": ".userprofile-vip-details-text", "contains": ["Aktiv seit"]},
+    "seller_badges": {"selector": ".userprofile-vip-badges .userbadge-tag", "all": True, "text": "textContent"},
+    "has_details": {"selector": "#viewad-details", "exists": True},
+    "details": {
+        "selector": "#viewad-details .addetailslist--detail",
+        "all": True,
+        "fields": {
+            "content": {"self": True, "text": "textContent"},
+            "value": {"selector": ".addetailslist--detail--value", "text": "textContent"},
+        },
+    },
+    "has_features": {"selector": "#viewad-configuration", "exists": True},
+    "features": {"selector": "#viewad-configuration .checktaglist .checktag", "all": True, "text": "textContent"},
+    "shipping": {"selector": ".boxedarticle--details--shipping"},
+    "location": {"selector": "#viewad-locality"},
+    "created_at": {"selector": "#viewad-extra-info > div:nth-child(1) > span"},
+}
+
+EXTRACT_SCRIPT = """
+(schema) => {
+    const normalize = (text) => (text || "").replace(/\\s+/g, " ").toLowerCase();
+    const read = (el, spec) => {
+        if (spec.attr) return el.getAttribute(spec.attr);
+        return spec.text === "textContent" ? el.textContent : el.innerText;
+    };
+    const extract = (root, spec) => {
+        let els = spec.self ? [root] : Array.from(root.querySelectorAll(spec.selector));
+        if (spec.contains) {
+            const needles = spec.contains.map(normalize);
+            els = els.filter((el) => needles.some((needle) => normalize(el.textContent).includes(needle)));
+        }
+        if (spec.exists) return els.length > 0;
+        const one = (el) => {
+            if (!spec.fields) return read(el, spec);
+            const record = {};
+            for (const [name, field] of Object.entries(spec.fields)) record[name] = extract(el, field);
+            return record;
+        };
+        if (spec.all) return els.map(one);
+        return els.length ? one(els[0]) : null;
+    };
+    const result = {_errors: []};
+    for (const [name, spec] of Object.entries(schema)) {
+        try {
+            result[name] = extract(document, spec);
+        } catch (e) {
+            result[name] = null;
+            result._errors.push(name);
+        }
+    }
+    return result;
+}
+"""
+
+
+async def extract_record(page: Page, schema: Dict[str, Dict[str, Any]] = DETAIL_SCHEMA) -> Dict[str, Any]:
+    return await page.evaluate(EXTRACT_SCRIPT, schema)
+
+
+BLOCK_TAGS = frozenset(("address", "article", "br", "dd", "div", "dl", "dt", "footer", "h1", "h2", "h3", "h4", "h5",
+                        "h6", "header", "li", "ol", "p", "section", "table", "tr", "ul"))
+HIDDEN_TAGS = frozenset(("script", "style", "noscript", "template"))
+
+
+def _inner_text(node: Node) -> str:
+    # Annäherung an innerText ohne Layout: Zeilenumbrüche an Block-Elementen und <br>,
+    # Whitespace innerhalb einer Zeile zusammengefasst, Skripte ausgelassen
+    parts: List[str] = []
+    for child in node.traverse(include_text=True):
+        if child.tag == "-text":
+            if child.parent is None or child.parent.tag not in HIDDEN_TAGS:
+                parts.append(child.text(deep=False))
+        elif child.tag in BLOCK_TAGS:
+            parts.append("\n")
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _read_node(node: Node, spec: Dict[str, Any]) -> Optional[str]:
+    if spec.get("attr"):
+        return node.attributes.get(spec["attr"])
+    return node.text() if spec.get("text") == "textContent" else _inner_text(node)
+
+
+def _extract_html(root: Node, spec: Dict[str, Any]) -> Any:
+    nodes: List[Node] = [root] if spec.get("self") else root.css(spec["selector"])
+    if spec.get("contains"):
+        needles = [" ".join(needle.split()).lower() for needle in spec["contains"]]
+        nodes = [node for node in nodes
+                 if any(needle in " ".join(node.text().split()).lower() for needle in needles)]
+    if spec.get("exists"):
+        return bool(nodes)
+
+    def one(node: Node) -> Any:
+        if not spec.get("fields"):
+            return _read_node(node, spec)
+        return {name: _extract_html(node, field) for name, field in spec["fields"].items()}
+
+    if spec.get("all"):
+        return [one(node) for node in nodes]
+    return one(nodes[0]) if nodes else None
+
+
+def extract_record_html(html: str, schema: Dict[str, Dict[str, Any]] = DETAIL_SCHEMA) -> Dict[str, Any]:
+    # Gleiches Schema und gleiches Ergebnisformat wie EXTRACT_SCRIPT, aber ohne Browser (z.B. für Snapshots)
+    tree: LexborHTMLParser = LexborHTMLParser(html)
+    root: Optional[Node] = tree.root
+    result: Dict[str, Any] = {"_errors": []}
+    for name, spec in schema.items():
+        try:
+            result[name] = _extract_html(root, spec)
+        except Exception:
+            result[name] = None
+            result["_errors"].append(name)
+    return result
+
+
+AD_LIST_ITEM_SELECTOR = ".ad-listitem:not(.is-topad):not(.badge-hint-pro-small-srp)"
+AD_LIST_PRICE_SELECTOR = "p.aditem-main--middle--price-shipping--price"
+AD_LIST_LOCATION_SELECTOR = ".aditem-main--top--left"
+LIST_DISTANCE_SUFFIX = re.compile(r"\s*\([^)]*km\)$")
+BOT_CHALLENGE_MARKERS = (
+    "challenge-platform",
+    "captcha-delivery.com",
+    "px-captcha",
+    "<title>access denied</title>",
+    "zugriff verweigert",
+)
+# Cookie-Banner der Startseite ("Alle akzeptieren")
+CONSENT_ACCEPT_SELECTOR = "#gdpr-banner-accept"
+AD_NOT_FOUND_MARKERS = (
+    "anzeige ist nicht mehr verfügbar",
+    "seite nicht gefunden",
+)
+
+
+def clean_list_price(price_text: str) -> str:
+    return price_text.replace("€", "").replace("VB", "").replace(".", "").strip()
+
+
+def is_negotiable(price_text: str) -> bool:
+    return "VB" in price_text
+
+
+def clean_list_location(location_text: str) -> str:
+    # "10178 Mitte (3 km)" -> "10178 Mitte"; die Entfernung hängt nur an der Suchanfrage
+    return LIST_DISTANCE_SUFFIX.sub("", " ".join(location_text.split()))
+
+
+def is_bot_challenge(html: str) -> bool:
+    lowered: str = html.lower()
+    return any(marker in lowered for marker in BOT_CHALLENGE_MARKERS)
+
+
+def is_ad_not_found(html: str) -> bool:
+    lowered: str = html.lower()
+    return any(marker in lowered for marker in AD_NOT_FOUND_MARKERS)
+
+
+def is_empty_result_list(html: str) -> bool:
+    # Ergebnisseite mit Trefferliste, aber ohne Anzeigen; fehlt die Liste ganz, hat sich das Layout geändert
+    tree: LexborHTMLParser = LexborHTMLParser(html)
+    return tree.css_first("#srchrslt-adtable") is not None and not tree.css(AD_LIST_ITEM_SELECTOR)
+
+
+def _node_text(node: Optional[Node]) -> str:
+    # Annäherung an innerText: Whitespace wie beim Rendern zusammenfassen
+    return " ".join(node.text(separator=" ").split()) if node else ""
+
+
+def parse_ads_html(html: str, base_url: str = "https://www.kleinanzeigen.de") -> List[Listing]:
+    tree: LexborHTMLParser = LexborHTMLParser(html)
+    items: List[Node] = tree.css(AD_LIST_ITEM_SELECTOR)
+    if not items and tree.css_first("#srchrslt-adtable") is None:
+        raise ValueError("Search result list not found, page layout may have changed")
+
+    results: List[Listing] = []
+    for item in items:
+        article: Optional[Node] = item.css_first("article")
+        if not article:
+            continue
+
+        data_adid: Optional[str] = article.attributes.get("data-adid")
+        data_href: Optional[str] = article.attributes.get("data-href")
+        if not data_adid or not data_href:
+            continue
+
+        price_text: str = _node_text(article.css_first(AD_LIST_PRICE_SELECTOR))
+        results.append(Listing(
+            adid=data_adid,
+            url=f"{base_url}{data_href}",
+            title=_node_text(article.css_first("h2 a")),
+            price=clean_list_price(price_text),
+            description=_node_text(article.css_first("p.aditem-main--middle--description")),
+            negotiable=is_negotiable(price_text),
+            location=clean_list_location(_node_text(article.css_first(AD_LIST_LOCATION_SELECTOR))),
+        ))
+
+    return results
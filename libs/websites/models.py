@@ -0,0 +1,139 @@
+import re
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+Number = Union[int, float]
+
+_PUBLIC_FIELDS: Dict[type, Tuple[str, ...]] = {}
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_number(text: Optional[str]) -> Optional[Number]:
+    # "1250" -> 1250, "12.50" -> 12.5; alles ohne Zahl -> None
+    match = _NUMBER.search(text or "")
+    if not match:
+        return None
+    value = match.group(0)
+    return float(value) if "." in value else int(value)
+
+
+class Record:
+    """Basis der Ergebnistypen: schlanke Slots-Dataclasses, die orjson direkt serialisiert.
+
+    Felder mit führendem Unterstrich (vorab geparste Zahlen) erscheinen nicht im JSON. Der
+    lesende Dict-Zugriff (record["adid"], record.get("price"), {**record}) bleibt erhalten,
+    damit bestehender Code unverändert mit den Records arbeitet.
+    """
+    __slots__ = ()
+
+    def keys(self) -> Tuple[str, ...]:
+        cls = type(self)
+        if cls not in _PUBLIC_FIELDS:
+            _PUBLIC_FIELDS[cls] = tuple(f.name for f in fields(cls) if not f.name.startswith("_"))
+        return _PUBLIC_FIELDS[cls]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.keys()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.keys() else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: _plain(getattr(self, key)) for key in self.keys()}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+@dataclass(slots=True)
+class Price(Record):
+    amount: str
+    currency: str = "€"
+    negotiable: bool = False
+    _value: Optional[Number] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self._value is None:
+            self._value = parse_number(self.amount)
+
+    @property
+    def value(self) -> Optional[Number]:
+        return self._value
+
+
+@dataclass(slots=True)
+class Location(Record):
+    zip: str = ""
+    city: str = ""
+    state: str = ""
+
+
+@dataclass(slots=True)
+class Seller(Record):
+    name: Optional[str] = None
+    since: Optional[str] = None
+    type: str = "private"
+    badges: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ExtraInfo(Record):
+    created_at: Optional[str] = None
+    views: str = "0"
+
+
+@dataclass(slots=True)
+class Listing(Record):
+    adid: str
+    url: str
+    title: str = ""
+    price: str = ""
+    description: str = ""
+    negotiable: bool = False
+    location: str = ""
+    _price_value: Optional[Number] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self._price_value is None:
+            self._price_value = parse_number(self.price.replace(",", "."))
+
+    @property
+    def price_value(self) -> Optional[Number]:
+        return self._price_value
+
+
+@dataclass(slots=True)
+class Detail(Record):
+    id: str
+    categories: List[str]
+    title: str
+    price: Price
+    shipping: bool
+    location: Location
+    views: str
+    description: Optional[str]
+    images: List[str]
+    details: Dict[str, str]
+    features: Any
+    seller: Seller
+    extra_info: ExtraInfo
+    _views: Optional[int] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self._views is None:
+            views = parse_number(self.views)
+            self._views = int(views) if views is not None else None
+
+    @property
+    def views_count(self) -> Optional[int]:
+        return self._views
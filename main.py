@@ -1,10 +1,64 @@
-from fastapi import FastAPI
-from routers import inserate, inserat
+from contextlib import asynccontextmanager
+import time
+from fastapi import Depends, FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from routers import inserate, inserat, jobs, store, watches
 import os
 from fastapi.middleware.cors import CORSMiddleware
+from scrapers.jobs import JobScheduler
+from scrapers.watch import WatchScheduler
+from utils import config
+from utils.ad_store import close_ad_store, open_ad_store
+from utils.browser_pool import BrowserPool, get_browser_pool
+from utils.cache import create_cache, get_response_cache
+from utils.http_client import close_http_client
+from utils.job_store import JobStore
+from utils.metrics import REQUEST_SECONDS, AppStatsCollector
+from utils.rate_limit import host_scheduler
+from utils.responses import ORJSONResponse, json_response
+from utils.singleflight import inflight
+from utils.snapshot_store import close_snapshot_store, open_snapshot_store
+from utils.watch_store import WatchStore
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Browser einmalig starten und über alle Anfragen hinweg wiederverwenden
+    app.state.browser_pool = BrowserPool()
+    app.state.response_cache = create_cache()
+    app.state.watch_store = WatchStore()
+    app.state.watch_scheduler = WatchScheduler(app.state.watch_store, app.state.browser_pool)
+    app.state.job_store = JobStore()
+    app.state.job_scheduler = JobScheduler(app.state.job_store, app.state.browser_pool)
+    app.state.ad_store = await open_ad_store()
+    app.state.snapshot_store = open_snapshot_store()
+    if config.BROWSER_STARTUP == "eager":
+        await app.state.browser_pool.start()
+    elif config.BROWSER_STARTUP == "background":
+        app.state.browser_pool.prewarm()
+    await app.state.watch_scheduler.start()
+    await app.state.job_scheduler.start()
+    collector = AppStatsCollector(app)
+    REGISTRY.register(collector)
+    try:
+        yield
+    finally:
+        REGISTRY.unregister(collector)
+        await app.state.job_scheduler.close()
+        await app.state.job_store.close()
+        await app.state.watch_scheduler.close()
+        await app.state.watch_store.close()
+        await app.state.browser_pool.close()
+        await app.state.response_cache.close()
+        await close_ad_store()
+        close_snapshot_store()
+        await close_http_client()
+
 
 app = FastAPI(
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS-Middleware hinzufügen
@@ -16,26 +70,82 @@ app.add_middleware(
     allow_headers=["*"],  # Erlaubt alle Header
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    # Gemessen bis die Response-Header stehen; bei Streams also die Zeit bis zum ersten Byte
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        REQUEST_SECONDS.labels(endpoint, request.method, str(status)).observe(time.perf_counter() - started)
+
 @app.get("/")
 async def root():
     return {
         "message": "Welcome to the Kleinanzeigen API",
         "endpoints": [
             "/inserate",
+            "/inserate/stats",
             "/inserat/{id}",
-            "/find"  # Falls dieser Endpunkt existieren soll
+            "/find",  # Falls dieser Endpunkt existieren soll
+            "/watches",
+            "/jobs",
+            "/store/search",
+            "/stats",
+            "/ready",
+            "/metrics"
         ]
     }
 
+@app.get("/stats")
+async def stats(request: Request, browser_pool: BrowserPool = Depends(get_browser_pool),
+                cache=Depends(get_response_cache)):
+    return {
+        "browser_pool": browser_pool.stats(),
+        "cache": cache.stats(),
+        "singleflight": inflight.stats(),
+        "navigation": host_scheduler.stats(),
+        "watches": request.app.state.watch_scheduler.stats(),
+        "jobs": request.app.state.job_scheduler.stats(),
+        "resource_blocking": browser_pool.resource_blocker.stats() if browser_pool.resource_blocker else None,
+        "ad_store": request.app.state.ad_store.stats() if request.app.state.ad_store else None,
+        "snapshots": request.app.state.snapshot_store.stats() if request.app.state.snapshot_store else None,
+    }
+
+@app.get("/ready")
+async def ready(browser_pool: BrowserPool = Depends(get_browser_pool)):
+    # Für Readiness-Probes: erst 200, wenn der Browser-Pool warm ist
+    is_ready = browser_pool.state == "ready"
+    return json_response({"ready": is_ready, "browser_pool": browser_pool.state,
+                          "startup_seconds": browser_pool.startup_seconds},
+                         status_code=200 if is_ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 app.include_router(inserate.router)
 app.include_router(inserat.router)
+app.include_router(watches.router)
+app.include_router(store.router)
+app.include_router(jobs.router)
 
 # Alias für /inserate als /find (falls dies benötigt wird)
 @app.get("/find")
-async def find_alias(query: str = None, location: str = None, radius: int = None, 
-                    min_price: int = None, max_price: int = None, page_count: int = 1):
+async def find_alias(request: Request, response: Response,
+                    query: str = None, location: str = None, radius: int = None,
+                    min_price: int = None, max_price: int = None, page_count: int = 1, engine: str = None,
+                    browser_pool: BrowserPool = Depends(get_browser_pool), cache=Depends(get_response_cache)):
     # Verwendet direkt die get_inserate Funktion aus dem inserate Router
-    return await inserate.get_inserate(query, location, radius, min_price, max_price, page_count)
+    return await inserate.get_inserate(request=request, response=response, query=query, location=location,
+                                       radius=radius, min_price=min_price, max_price=max_price, page_count=page_count, engine=engine, stream=None,
+                                       enrich=False, enrich_concurrency=None, enrich_timeout=None,
+                                       browser_pool=browser_pool, cache=cache)
 
 # Für den Render.com-Deployment
 if __name__ == "__main__":
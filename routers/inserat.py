@@ -1,31 +1,87 @@
-from scrapers.inserat import get_inserate_details
-from fastapi import APIRouter, HTTPException
-from utils.browser import PlaywrightManager
+import asyncio
+from typing import List, Optional
+
+from scrapers.inserat import fetch_inserat
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from utils import config
+from utils.browser_pool import BrowserPool, get_browser_pool
+from utils.cache import cache_directives, cached_call, cached_response, get_response_cache, make_cache_key
+from utils.responses import dumps, json_response
+from utils.singleflight import inflight
 
 router = APIRouter()
 
+
+class DetailsBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=config.BATCH_MAX_IDS)
+    concurrency: Optional[int] = Field(None, ge=1, le=config.BATCH_MAX_CONCURRENCY)
+
+
 @router.get("/inserat/{id}")
-async def get_inserat(id: str):
-    browser_manager = PlaywrightManager()
-    await browser_manager.start()
-    try:
-        page = await browser_manager.new_context_page()
+async def get_inserat(id: str, request: Request, response: Response,
+                      browser_pool: BrowserPool = Depends(get_browser_pool),
+                      cache=Depends(get_response_cache)):
+    async def scrape():
+        return await coalesced_fetch_inserat(browser_pool, id)
+
+    result = await cached_response(cache, request, response, make_cache_key("inserat", id=id),
+                                   config.CACHE_TTL_DETAIL, scrape)
+    return json_response({"success": True, "data": result}, response)
+
+
+@router.post("/inserate/details")
+async def get_inserate_batch(batch: DetailsBatchRequest,
+                             request: Request,
+                             stream: str = Query(None, pattern="^ndjson$"),
+                             browser_pool: BrowserPool = Depends(get_browser_pool),
+                             cache=Depends(get_response_cache)):
+    bypass, store = cache_directives(request)
+    semaphore = asyncio.Semaphore(batch.concurrency or config.BATCH_CONCURRENCY)
+
+    async def fetch(id: str) -> dict:
+        async with semaphore:
+            return await fetch_detail_result(browser_pool, cache, id, bypass, store=store)
+
+    if stream != "ndjson":
+        return json_response({"success": True, "data": await asyncio.gather(*(fetch(id) for id in batch.ids))})
+
+    async def ndjson():
+        # Ergebnisse in Abschlussreihenfolge ausgeben, statt den ganzen Batch zu puffern
+        tasks = [asyncio.ensure_future(fetch(id)) for id in batch.ids]
         try:
-            # Verwende die klarere URL-Form (ohne 's-anzeige') für bessere Kompatibilität
-            url = f"https://www.kleinanzeigen.de/s-anzeige/{id}"
-            result = await get_inserate_details(url, page)
-            return {"success": True, "data": result}
-        except Exception as e:
-            # Bei Fehler versuche einen alternativen URL-Muster
-            alternative_url = f"https://www.kleinanzeigen.de/anzeigen/{id}"
-            try:
-                result = await get_inserate_details(alternative_url, page)
-                return {"success": True, "data": result}
-            except Exception as inner_e:
-                raise HTTPException(status_code=404, detail=f"Inserat mit ID {id} nicht gefunden: {str(inner_e)}")
+            for completed in asyncio.as_completed(tasks):
+                yield dumps(await completed) + "\n"
         finally:
-            await browser_manager.close_page(page)
+            # Client hat die Verbindung getrennt: restliche Abrufe abbrechen
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+async def fetch_detail_result(browser_pool: BrowserPool, cache, id: str, bypass: bool = False,
+                              timeout: Optional[float] = None, store: bool = True) -> dict:
+    # Ergebnis eines Eintrags für Batch-Abrufe und Anreicherung; Fehler werden nicht geworfen
+    async def fetch():
+        return await cached_call(cache, make_cache_key("inserat", id=id), config.CACHE_TTL_DETAIL,
+                                 lambda: coalesced_fetch_inserat(browser_pool, id, timeout), bypass=bypass,
+                                 store=store)
+
+    try:
+        # wait_for begrenzt auch das Warten auf eine freie Seite, das nicht zum Detail-Budget zählt
+        result, _ = await asyncio.wait_for(fetch(), timeout) if timeout else await fetch()
+        return {"id": id, "success": True, "data": result}
+    except HTTPException as e:
+        return {"id": id, "success": False, "status": e.status_code, "error": e.detail}
+    except asyncio.TimeoutError:
+        return {"id": id, "success": False, "status": 504, "error": f"Zeitlimit von {timeout:g}s überschritten"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen des Inserats: {str(e)}")
-    finally:
-        await browser_manager.close() 
\ No newline at end of file
+        return {"id": id, "success": False, "status": 500, "error": str(e)}
+
+
+async def coalesced_fetch_inserat(browser_pool: BrowserPool, id: str, budget: Optional[float] = None):
+    # Gleichzeitige Abrufe derselben Anzeige teilen sich einen Scrape
+    return await inflight.do(f"{config.BASE_URL}/s-anzeige/{id}",
+                             lambda: fetch_inserat(browser_pool, id, budget))
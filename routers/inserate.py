@@ -1,22 +1,215 @@
-from fastapi import APIRouter, Query
+import asyncio
 
-from scrapers.inserate import get_inserate_klaz
-from utils.browser import PlaywrightManager
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from routers.inserat import fetch_detail_result
+from scrapers.inserate import SEARCH_PARAMS, build_search_url, get_inserate_klaz, get_inserate_page, iter_inserate_klaz
+from utils import config
+from utils.browser_pool import BrowserPool, get_browser_pool
+from utils.cache import cache_directives, cached_call, cached_response, get_response_cache, make_cache_key
+from utils.cursor import decode_cursor, encode_cursor, fingerprint
+from utils.responses import dumps, json_response
+from utils.singleflight import inflight
 
 router = APIRouter()
 
 
+# Referenzen auf laufende Prefetch-Tasks, damit sie nicht vorzeitig eingesammelt werden
+_prefetch_tasks = set()
+
+
 @router.get("/inserate")
-async def get_inserate(query: str = Query(None),
+async def get_inserate(request: Request,
+                       response: Response,
+                       query: str = Query(None),
                        location: str = Query(None),
                        radius: int = Query(None),
                        min_price: int = Query(None),
                        max_price: int = Query(None),
-                       page_count: int = Query(1, ge=1, le=20)):
-    browser_manager = PlaywrightManager()
-    await browser_manager.start()
+                       page_count: int = Query(1, ge=1, le=20),
+                       engine: str = Query(None, pattern="^(browser|http)$"),
+                       stream: str = Query(None, pattern="^(ndjson|sse)$"),
+                       enrich: bool = Query(False),
+                       enrich_concurrency: int = Query(None, ge=1, le=config.ENRICH_MAX_CONCURRENCY),
+                       enrich_timeout: float = Query(None, gt=0, le=config.DETAIL_DEADLINE),
+                       browser_pool: BrowserPool = Depends(get_browser_pool),
+                       cache=Depends(get_response_cache)):
+    key = make_cache_key("inserate", query=query, location=location, radius=radius, min_price=min_price,
+                         max_price=max_price, page_count=page_count)
+    enrich_page = None
+    if enrich:
+        bypass, store = cache_directives(request)
+        semaphore = asyncio.Semaphore(enrich_concurrency or config.ENRICH_CONCURRENCY)
+
+        async def enrich_page(ads: list) -> list:
+            return await enrich_ads(browser_pool, cache, ads, semaphore, enrich_timeout or config.ENRICH_TIMEOUT,
+                                    bypass, store)
+
+    if stream:
+        pages = iter_inserate_klaz(browser_pool, query, location, radius, min_price, max_price, page_count, engine)
+        return await stream_inserate(request, cache, key, pages, stream, enrich_page)
+
+    results = await search_results(request, response, browser_pool, cache, key, query, location, radius, min_price,
+                                   max_price, page_count, engine)
+    if enrich_page:
+        # Die Trefferliste und die Details liegen getrennt im Cache; angereicherte Listen werden nicht gespeichert
+        results = await enrich_page(results)
+    return json_response({"success": True, "data": results}, response)
+
+
+@router.get("/inserate/stats")
+async def get_inserate_stats(request: Request,
+                             response: Response,
+                             query: str = Query(None),
+                             location: str = Query(None),
+                             radius: int = Query(None),
+                             min_price: int = Query(None),
+                             max_price: int = Query(None),
+                             page_count: int = Query(1, ge=1, le=20),
+                             engine: str = Query(None, pattern="^(browser|http)$"),
+                             bins: int = Query(20, ge=1, le=200),
+                             zip_digits: int = Query(2, ge=1, le=5),
+                             outlier_factor: float = Query(1.5, gt=0),
+                             browser_pool: BrowserPool = Depends(get_browser_pool),
+                             cache=Depends(get_response_cache)):
+    # Gleicher Cache-Eintrag wie /inserate: bereits gesuchte Ergebnisse werden ohne Scrape ausgewertet
+    key = make_cache_key("inserate", query=query, location=location, radius=radius, min_price=min_price,
+                         max_price=max_price, page_count=page_count)
+    results = await search_results(request, response, browser_pool, cache, key, query, location, radius, min_price,
+                                   max_price, page_count, engine)
+    # numpy erst hier laden, damit der Kaltstart der API nicht darauf wartet
+    from utils.market_stats import market_stats
+
+    stats = market_stats(results, bins=bins, zip_digits=zip_digits, outlier_factor=outlier_factor)
+    return json_response({"success": True, "data": stats}, response)
+
+
+async def search_results(request: Request, response: Response, browser_pool: BrowserPool, cache, key: str,
+                         query, location, radius, min_price, max_price, page_count: int, engine) -> list:
+    async def scrape():
+        return await get_inserate_klaz(browser_pool, query, location, radius, min_price, max_price, page_count,
+                                       engine)
+
+    async def coalesced_scrape():
+        # Gleichzeitige identische Suchen teilen sich einen Scrape
+        url = build_search_url(query, location, radius, min_price, max_price)
+        return await inflight.do(f"{url}#pages={page_count}", scrape)
+
+    return await cached_response(cache, request, response, key, config.CACHE_TTL_SEARCH, coalesced_scrape)
+
+
+async def enrich_ads(browser_pool: BrowserPool, cache, ads: list, semaphore: asyncio.Semaphore, timeout: float,
+                     bypass: bool = False, store: bool = True) -> list:
+    # Details parallel über die Pool-Seiten laden; bei Fehler oder Zeitüberschreitung bleibt die Anzeige
+    # ohne Details in der Liste und erhält detail_error
+    async def enrich(ad) -> dict:
+        async with semaphore:
+            result = await fetch_detail_result(browser_pool, cache, ad["adid"], bypass, timeout, store)
+        if result["success"]:
+            return {**ad, "detail": result["data"]}
+        return {**ad, "detail": None, "detail_error": {"status": result["status"], "error": result["error"]}}
+
+    return list(await asyncio.gather(*(enrich(ad) for ad in ads)))
+
+
+async def stream_inserate(request: Request, cache, key: str, pages, stream: str,
+                          enrich_page=None) -> StreamingResponse:
+    bypass, store = cache_directives(request)
+    cached = await cache.get(key) if config.CACHE_TTL_SEARCH > 0 and not bypass else None
+
+    def encode(event: str, payload) -> str:
+        data = dumps(payload)
+        return f"event: {event}\ndata: {data}\n\n" if stream == "sse" else data + "\n"
+
+    async def events():
+        if cached is not None:
+            for ad in (await enrich_page(cached[0]) if enrich_page else cached[0]):
+                yield encode("ad", ad)
+            yield encode("end", {"success": True, "count": len(cached[0])})
+            return
+
+        results = []
+        try:
+            async for page_results in pages:
+                if await request.is_disconnected():
+                    return
+                for ad in (await enrich_page(page_results) if enrich_page else page_results):
+                    yield encode("ad", ad)
+                results.extend(page_results)
+        except Exception as e:
+            yield encode("error", {"success": False, "error": f"Scraping error: {str(e)}"})
+            return
+        finally:
+            # Bricht auch laufende Seitenabrufe ab, wenn der Client vorzeitig trennt
+            await pages.aclose()
+
+        if results and store and config.CACHE_TTL_SEARCH > 0:
+            await cache.set(key, results, config.CACHE_TTL_SEARCH)
+        yield encode("end", {"success": True, "count": len(results)})
+
+    media_type = "text/event-stream" if stream == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type,
+                             headers={"Cache-Status": "kleinanzeigen-api; " + ("hit" if cached else "fwd=miss")})
+
+
+@router.get("/inserate/page")
+async def get_inserate_cursor(request: Request,
+                              cursor: str = Query(None),
+                              query: str = Query(None),
+                              location: str = Query(None),
+                              radius: int = Query(None),
+                              min_price: int = Query(None),
+                              max_price: int = Query(None),
+                              engine: str = Query(None, pattern="^(browser|http)$"),
+                              browser_pool: BrowserPool = Depends(get_browser_pool),
+                              cache=Depends(get_response_cache)):
+    if cursor:
+        try:
+            params, page_number, seen = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Ungültiger Cursor: {str(e)}")
+    else:
+        params = {"query": query, "location": location, "radius": radius, "min_price": min_price,
+                  "max_price": max_price, "engine": engine}
+        page_number, seen = 1, set()
+
+    bypass, store = cache_directives(request)
+    ads = await search_page(browser_pool, cache, params, page_number, bypass, store)
+    # Anzeigen, die durch neue Inserate von der Vorseite nachgerutscht sind, nicht doppelt ausliefern
+    data = [ad for ad in ads if fingerprint(ad["adid"]) not in seen]
+
+    next_cursor = None
+    if ads:
+        next_cursor = encode_cursor(params, page_number + 1, [ad["adid"] for ad in ads])
+        if config.CURSOR_PREFETCH and config.CACHE_TTL_SEARCH > 0 and store:
+            # Nächste Seite vorladen, während der Client die aktuelle verarbeitet
+            task = asyncio.create_task(prefetch_search_page(browser_pool, cache, params, page_number + 1))
+            _prefetch_tasks.add(task)
+            task.add_done_callback(_prefetch_tasks.discard)
+
+    return json_response({"success": True, "data": data, "page": page_number, "next_cursor": next_cursor})
+
+
+async def search_page(browser_pool: BrowserPool, cache, params: dict, page_number: int, bypass: bool = False,
+                      store: bool = True):
+    search_params = {name: params.get(name) for name in SEARCH_PARAMS}
+    url = build_search_url(**search_params)
+
+    async def scrape():
+        # strict: eine nicht geladene Seite wird zum 5xx, damit der Client denselben Cursor erneut anfragen kann,
+        # statt eine leere Seite als Ende der Ergebnisse zu lesen
+        return await inflight.do(f"{url}#page={page_number}",
+                                 lambda: get_inserate_page(browser_pool, page_number, engine=params.get("engine"),
+                                                           strict=True, **search_params))
+
+    key = make_cache_key("inserate_page", page=page_number, **search_params)
+    result, _ = await cached_call(cache, key, config.CACHE_TTL_SEARCH, scrape, bypass=bypass, store=store)
+    return result
+
+
+async def prefetch_search_page(browser_pool: BrowserPool, cache, params: dict, page_number: int):
     try:
-        results = await get_inserate_klaz(browser_manager, query, location, radius, min_price, max_price, page_count)
-        return {"success": True, "data": results}
-    finally:
-        await browser_manager.close()
+        await search_page(browser_pool, cache, params, page_number)
+    except Exception as e:
+        print(f"[WARNING] Prefetch of page {page_number} failed: {str(e)}")
@@ -0,0 +1,86 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from utils import config
+from utils.job_store import JobStore
+
+router = APIRouter()
+
+
+class JobRequest(BaseModel):
+    type: str = Field(..., pattern="^(search|details)$")
+    query: Optional[str] = None
+    location: Optional[str] = None
+    radius: Optional[int] = None
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    engine: Optional[str] = Field(None, pattern="^(browser|http)$")
+    page_count: int = Field(1, ge=1, le=config.JOB_MAX_PAGES)
+    ids: Optional[List[str]] = Field(None, min_length=1, max_length=config.JOB_MAX_IDS)
+    concurrency: int = Field(config.JOB_DEFAULT_CONCURRENCY, ge=1, le=config.JOB_MAX_CONCURRENCY)
+
+
+def get_job_store(request: Request) -> JobStore:
+    return request.app.state.job_store
+
+
+async def _get_job_or_404(store: JobStore, id: str) -> dict:
+    job = await store.get_job(id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job mit ID {id} nicht gefunden")
+    return job
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(job: JobRequest, store: JobStore = Depends(get_job_store)):
+    if job.type == "details":
+        if not job.ids:
+            raise HTTPException(status_code=422, detail="Für Jobs vom Typ 'details' werden 'ids' benötigt")
+        params = {}
+        payloads = [{"id": id} for id in dict.fromkeys(job.ids)]
+    else:
+        params = job.model_dump(include={"query", "location", "radius", "min_price", "max_price", "engine"})
+        payloads = [{"page": page} for page in range(1, job.page_count + 1)]
+    created = await store.create_job(job.type, params, payloads, job.concurrency)
+    return {"success": True, "data": {**created, "progress": await store.progress(created["id"])}}
+
+
+@router.get("/jobs")
+async def list_jobs(store: JobStore = Depends(get_job_store)):
+    jobs = await store.list_jobs()
+    return {"success": True, "data": [{**job, "progress": await store.progress(job["id"])} for job in jobs]}
+
+
+@router.get("/jobs/{id}")
+async def get_job(id: str, results: bool = True, store: JobStore = Depends(get_job_store)):
+    # Teilergebnisse sind verfügbar, sobald die ersten Tasks fertig sind
+    job = await _get_job_or_404(store, id)
+    data = {**job, "progress": await store.progress(id)}
+    if results:
+        tasks = await store.tasks(id)
+        if job["type"] == "search":
+            seen, ads = set(), []
+            for task in tasks:
+                for ad in task["result"] or []:
+                    if ad["adid"] not in seen:
+                        seen.add(ad["adid"])
+                        ads.append(ad)
+            data["results"] = ads
+            data["errors"] = [{"page": task["payload"]["page"], "error": task["error"], "attempts": task["attempts"]}
+                              for task in tasks if task["status"] == "failed"]
+        else:
+            data["results"] = [
+                {"id": task["payload"]["id"], "success": True, "data": task["result"]}
+                if task["status"] == "done" else
+                {"id": task["payload"]["id"], "success": False, "error": task["error"], "attempts": task["attempts"]}
+                for task in tasks if task["status"] in ("done", "failed")
+            ]
+    return {"success": True, "data": data}
+
+
+@router.delete("/jobs/{id}")
+async def cancel_job(id: str, store: JobStore = Depends(get_job_store)):
+    await _get_job_or_404(store, id)
+    return {"success": True, "data": {"cancelled": await store.cancel_job(id)}}
@@ -0,0 +1,23 @@
+import time
+
+from fastapi import APIRouter, Depends, Query
+
+from utils.ad_store import AdStore, get_ad_store
+
+router = APIRouter()
+
+
+@router.get("/store/search")
+async def search_store(q: str = None,
+                       min_price: int = Query(None, ge=0),
+                       max_price: int = Query(None, ge=0),
+                       zip: str = Query(None, pattern=r"^\d{1,5}$"),
+                       category: str = None,
+                       since_days: float = Query(None, gt=0),
+                       limit: int = Query(50, ge=1, le=500),
+                       offset: int = Query(0, ge=0),
+                       store: AdStore = Depends(get_ad_store)):
+    # Beantwortet Abfragen nur aus dem lokalen Store, ohne Browser
+    since = time.time() - since_days * 86400 if since_days else None
+    results = await store.search(q, min_price, max_price, zip, category, since, limit, offset)
+    return {"success": True, "data": results}
@@ -0,0 +1,69 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+from utils import config
+from utils.watch_store import WatchStore
+
+router = APIRouter()
+
+
+class WatchRequest(BaseModel):
+    query: Optional[str] = None
+    location: Optional[str] = None
+    radius: Optional[int] = None
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    engine: Optional[str] = Field(None, pattern="^(browser|http)$")
+    interval_seconds: int = Field(config.WATCH_DEFAULT_INTERVAL, ge=config.WATCH_MIN_INTERVAL)
+    max_pages: int = Field(config.WATCH_MAX_PAGES, ge=1, le=50)
+    webhook_url: Optional[str] = Field(None, pattern="^https?://")
+    emit_initial: bool = False
+
+
+def get_watch_store(request: Request) -> WatchStore:
+    return request.app.state.watch_store
+
+
+async def _get_watch_or_404(store: WatchStore, id: str) -> dict:
+    watch = await store.get_watch(id)
+    if watch is None:
+        raise HTTPException(status_code=404, detail=f"Watch mit ID {id} nicht gefunden")
+    return watch
+
+
+@router.post("/watches")
+async def create_watch(watch: WatchRequest, store: WatchStore = Depends(get_watch_store)):
+    params = watch.model_dump(include={"query", "location", "radius", "min_price", "max_price", "engine"})
+    created = await store.create_watch(params, watch.interval_seconds, watch.max_pages, watch.webhook_url,
+                                       watch.emit_initial)
+    return {"success": True, "data": created}
+
+
+@router.get("/watches")
+async def list_watches(store: WatchStore = Depends(get_watch_store)):
+    return {"success": True, "data": await store.list_watches()}
+
+
+@router.get("/watches/{id}")
+async def get_watch(id: str, store: WatchStore = Depends(get_watch_store)):
+    return {"success": True, "data": await _get_watch_or_404(store, id)}
+
+
+@router.delete("/watches/{id}")
+async def delete_watch(id: str, store: WatchStore = Depends(get_watch_store)):
+    if not await store.delete_watch(id):
+        raise HTTPException(status_code=404, detail=f"Watch mit ID {id} nicht gefunden")
+    return {"success": True}
+
+
+@router.get("/watches/{id}/events")
+async def get_watch_events(id: str,
+                           after: int = Query(0, ge=0),
+                           limit: int = Query(100, ge=1, le=1000),
+                           store: WatchStore = Depends(get_watch_store)):
+    await _get_watch_or_404(store, id)
+    events = await store.events(id, after=after, limit=limit)
+    # Mit "after=last_id" holt der Client beim nächsten Aufruf nur neuere Events
+    return {"success": True, "data": events, "last_id": events[-1]["id"] if events else after}
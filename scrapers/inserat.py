@@ -1,133 +1,185 @@
+import asyncio
+from typing import Optional
 from fastapi import HTTPException
+
 from libs.websites import kleinanzeigen as lib
+from libs.websites.models import Detail, ExtraInfo
+from utils import config
+from utils.ad_store import persist_details
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.metrics import EXTRACTION_SECONDS, FALLBACKS, PARSE_ERRORS, SCRAPE_FAILURES, SELECTOR_TIMEOUTS, STAGE_SECONDS
+from utils.rate_limit import host_scheduler
+from utils.session import session_state
+from utils.snapshot_store import capture_snapshot, snapshots_enabled
 import re
-import asyncio
 
 
-async def get_inserate_details(url: str, page):
-    try:
-        # Optimierte Navigation und Timeouts
-        await page.goto(url, timeout=45000)
-        await page.wait_for_load_state("domcontentloaded", timeout=30000)
+class ScrapeFailure(Exception):
+    """Klassifizierter Fehlschlag eines Detailabrufs; kind entscheidet über Retry und Statuscode."""
 
-        # Optimiertes Warten auf wichtige Elemente
-        try:
-            await page.wait_for_selector("#viewad-title, .vap-title", state="visible", timeout=5000)
-        except:
-            print(f"[WARNING] Title element did not appear within 5 seconds for URL: {url}")
-            # Versuche mit einer Pause, die Seite hat vielleicht verzögerte Ladezeiten
-            await asyncio.sleep(2)
+    STATUS_CODES = {"not_found": 404, "challenge": 503, "timeout": 504, "layout": 502, "network": 502, "error": 500}
+    RETRYABLE = {"timeout", "layout", "network", "error"}
 
-        # Weniger aggressives Scraping mit Fehlerbehandlung für jedes Element
-        try:
-            ad_id = await lib.get_element_content(page, "#viewad-ad-id-box > ul > li:nth-child(2)",
-                                                default="")
-            if not ad_id:
-                # Alternative Methode für die ID
-                match = re.search(r'/(\d+)$', url)
-                ad_id = match.group(1) if match else "[ERROR] Ad ID not found"
-        except:
-            ad_id = "[ERROR] Ad ID not found"
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
 
-        try:
-            categories = [cat.strip() for cat in await lib.get_elements_content(page, ".breadcrump-link") if cat.strip()]
-        except:
-            categories = []
+    @property
+    def retryable(self) -> bool:
+        return self.kind in self.RETRYABLE
 
-        try:
-            title = await lib.get_element_content(page, "#viewad-title, .vap-title", default="[ERROR] Title not found")
-        except:
-            title = "[ERROR] Title not found"
+    @property
+    def status_code(self) -> int:
+        return self.STATUS_CODES[self.kind]
 
-        try:
-            price_element = await lib.get_element_content(page, "#viewad-price, .vap-price")
-            price = lib.parse_price(price_element)
-        except:
-            price = ""
 
-        try:
-            views = await lib.get_element_content(page, "#viewad-cntr-num")
-        except:
-            views = "0"
+def classify_exception(e: Exception) -> ScrapeFailure:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-        try:
-            description = await lib.get_element_content(page, "#viewad-description-text, .vap-description")
-            if description:
-                description = re.sub(r'[ \t]+', ' ', description).strip()
-                description = re.sub(r'\n+', '\n', description)
-        except:
-            description = ""
-
-        # Asynchron mehrere Elemente parallel scrapen
-        images, seller_details, details, features, shipping, location, extra_info = await asyncio.gather(
-            get_images(page),
-            get_seller(page),
-            get_details(page),
-            get_features(page),
-            get_shipping(page),
-            get_location(page),
-            get_extra_info(page)
-        )
-
-        return {
-            "id": ad_id,
-            "categories": categories,
-            "title": title.split(" • ")[-1].strip() if " • " in title else title.strip(),
-            "price": price,
-            "shipping": shipping,
-            "location": location,
-            "views": views if views else "0",
-            "description": description,
-            "images": images,
-            "details": details,
-            "features": features,
-            "seller": seller_details,
-            "extra_info": extra_info,
-        }
-    except Exception as e:
-        print(f"[ERROR] {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    if isinstance(e, ScrapeFailure):
+        return e
+    if isinstance(e, (PlaywrightTimeoutError, DeadlineExceeded, asyncio.TimeoutError)):
+        return ScrapeFailure("timeout", str(e))
+    if "net::ERR_" in str(e):
+        return ScrapeFailure("network", str(e))
+    return ScrapeFailure("error", str(e))
 
-# Helper-Funktionen für parallelisiertes Scraping
-async def get_images(page):
-    try:
-        return await lib.get_image_sources(page, "#viewad-image")
-    except:
-        return []
-
-async def get_seller(page):
-    try:
-        return await lib.get_seller_details(page)
-    except:
-        return {}
 
-async def get_details(page):
-    try:
-        return await lib.get_details(page) if await page.query_selector("#viewad-details") else {}
-    except:
-        return {}
-
-async def get_features(page):
-    try:
-        return await lib.get_features(page) if await page.query_selector("#viewad-configuration") else {}
-    except:
-        return {}
+async def get_inserate_details(url: str, page, deadline: Optional[Deadline] = None):
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-async def get_shipping(page):
+    deadline = deadline or Deadline(config.DETAIL_DEADLINE)
     try:
-        shipping = await lib.get_element_content(page, ".boxedarticle--details--shipping")
-        return True if shipping else False
-    except:
-        return False
+        # Wartezeit auf einen Navigations-Slot zählt zum Zeitbudget
+        async with host_scheduler.navigation(url, timeout=deadline.remaining()) as navigation:
+            with STAGE_SECONDS.labels("goto", "detail").time():
+                response = await page.goto(url, timeout=deadline.timeout_ms(45000))
+            navigation.status(response.status if response is not None else None)
+            if response is not None and response.status in (404, 410):
+                raise ScrapeFailure("not_found", f"HTTP {response.status} for {url}")
+            if response is not None and response.status in (403, 429):
+                raise ScrapeFailure("challenge", f"HTTP {response.status} for {url}")
+            with STAGE_SECONDS.labels("load_state", "detail").time():
+                await page.wait_for_load_state("domcontentloaded", timeout=deadline.timeout_ms(30000))
 
-async def get_location(page):
-    try:
-        return await lib.get_location(page)
-    except:
-        return ""
+        try:
+            with STAGE_SECONDS.labels("wait_for_selector", "detail").time():
+                await page.wait_for_selector("#viewad-title, .vap-title", state="visible",
+                                             timeout=deadline.timeout_ms(5000))
+        except PlaywrightTimeoutError:
+            SELECTOR_TIMEOUTS.labels("#viewad-title").inc()
+            # Statt blind zu warten: Seite einmal klassifizieren
+            html = await page.content()
+            if lib.is_bot_challenge(html):
+                host_scheduler.report(url, "challenge")
+                raise ScrapeFailure("challenge", f"Bot challenge for {url}")
+            if lib.is_ad_not_found(html):
+                raise ScrapeFailure("not_found", f"Ad not available: {url}")
+            print(f"[WARNING] Title element did not appear within 5 seconds for URL: {url}")
 
-async def get_extra_info(page):
+        if snapshots_enabled():
+            await capture_snapshot("detail", url, await page.content())
+
+        # Alle Felder in einem einzigen Roundtrip zum Browser auslesen
+        with EXTRACTION_SECONDS.labels("extract_record").time():
+            record = await lib.extract_record(page, lib.DETAIL_SCHEMA)
+        for field in record.pop("_errors", None) or []:
+            PARSE_ERRORS.labels(field).inc()
+        if not record.get("title"):
+            PARSE_ERRORS.labels("title").inc()
+            if not record.get("ad_id"):
+                raise ScrapeFailure("layout", f"Neither title nor ad ID found on {url}")
+        with EXTRACTION_SECONDS.labels("build_inserat_details").time():
+            details = build_inserat_details(record, url)
+        persist_details(details, url)
+        return details
+    except Exception as e:
+        failure = classify_exception(e)
+        SCRAPE_FAILURES.labels("detail", failure.kind).inc()
+        if failure.kind == "challenge":
+            session_state.invalidate("challenge")
+        print(f"[ERROR] {failure.kind}: {str(e)}")
+        if failure is e:
+            raise
+        raise failure from e
+
+
+async def fetch_inserat(browser_pool, id: str, budget: Optional[float] = None):
+    # Ein gemeinsames Zeitbudget für Seite, Navigation, Selector-Waits und Fallback-URL
+    deadline = Deadline(min(budget, config.DETAIL_DEADLINE) if budget else config.DETAIL_DEADLINE)
     try:
-        return await lib.get_extra_info(page)
-    except:
-        return {}
+        page = await browser_pool.new_context_page("detail")
+        try:
+            # Verwende die klarere URL-Form (ohne 's-anzeige') für bessere Kompatibilität
+            url = f"{config.BASE_URL}/s-anzeige/{id}"
+            try:
+                return await get_inserate_details(url, page, deadline.share(0.6))
+            except ScrapeFailure as e:
+                # Eindeutige 404- oder Bot-Seiten werden mit der zweiten URL nicht besser
+                if not e.retryable or deadline.expired:
+                    raise
+            # Bei Fehler versuche einen alternativen URL-Muster
+            FALLBACKS.labels("detail_alternative_url").inc()
+            alternative_url = f"{config.BASE_URL}/anzeigen/{id}"
+            return await get_inserate_details(alternative_url, page, deadline)
+        finally:
+            await browser_pool.close_page(page)
+    except ScrapeFailure as e:
+        headers = {"Retry-After": "60"} if e.kind == "challenge" else None
+        if e.kind == "not_found":
+            detail = f"Inserat mit ID {id} nicht gefunden: {str(e)}"
+        else:
+            detail = f"Fehler beim Abrufen des Inserats ({e.kind}): {str(e)}"
+        raise HTTPException(status_code=e.status_code, detail=detail, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Fehler beim Abrufen des Inserats: {str(e)}")
+
+
+def build_inserat_details(record: dict, url: str) -> Detail:
+    ad_id = record.get("ad_id")
+    if not ad_id:
+        # Alternative Methode für die ID
+        match = re.search(r'/(\d+)$', url)
+        ad_id = match.group(1) if match else "[ERROR] Ad ID not found"
+
+    categories = [cat.strip() for cat in record.get("categories") or [] if cat and cat.strip()]
+
+    title = record.get("title") or "[ERROR] Title not found"
+
+    description = record.get("description")
+    if description:
+        description = re.sub(r'[ \t]+', ' ', description).strip()
+        description = re.sub(r'\n+', '\n', description)
+
+    views = record.get("views")
+    image = record.get("images")
+
+    if record.get("has_details"):
+        details = lib.build_details([(row.get("content") or "", row.get("value"))
+                                     for row in record.get("details") or []])
+    else:
+        details = {}
+
+    features = lib.build_features(record.get("features") or []) if record.get("has_features") else {}
+
+    return Detail(
+        id=ad_id,
+        categories=categories,
+        title=title.split(" • ")[-1].strip() if " • " in title else title.strip(),
+        price=lib.parse_price(record.get("price")),
+        shipping=bool(record.get("shipping")),
+        location=lib.split_location(record.get("location")),
+        views=views if views else "0",
+        description=description,
+        images=[image] if image else [],
+        details=details,
+        features=features,
+        seller=lib.build_seller_details(record.get("seller_name"), record.get("seller_type"),
+                                        record.get("seller_since"), record.get("seller_badges") or []),
+        extra_info=ExtraInfo(
+            created_at=record.get("created_at"),
+            views=views if views is not None else "0",
+        ),
+    )
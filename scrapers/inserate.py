@@ -1,18 +1,29 @@
+from typing import AsyncIterator, List
 from urllib.parse import urlencode
 import asyncio
 from fastapi import HTTPException
 
+from libs.websites import kleinanzeigen as lib
+from libs.websites.models import Listing
+from utils import config
+from utils.ad_store import persist_ads
 from utils.browser import PlaywrightManager
+from utils.http_client import get_http_client
+from utils.metrics import EXTRACTION_SECONDS, FALLBACKS, PARSE_ERRORS, SCRAPE_FAILURES, SELECTOR_TIMEOUTS, STAGE_SECONDS
+from utils.rate_limit import host_scheduler
+from utils.session import session_state
+from utils.snapshot_store import capture_snapshot, snapshots_enabled
 
+# Parameter von build_search_url; Cursor, Watches und Jobs speichern Suchen unter diesen Namen
+SEARCH_PARAMS = ("query", "location", "radius", "min_price", "max_price")
 
-async def get_inserate_klaz(browser_manager: PlaywrightManager,
-                            query: str = None,
-                            location: str = None,
-                            radius: int = None,
-                            min_price: int = None,
-                            max_price: int = None,
-                            page_count: int = 1):
-    base_url = "https://www.ebay-kleinanzeigen.de"
+
+def build_search_url(query: str = None,
+                     location: str = None,
+                     radius: int = None,
+                     min_price: int = None,
+                     max_price: int = None) -> str:
+    base_url = config.BASE_URL
 
     # Build the price filter part of the path
     price_path = ""
@@ -35,113 +46,295 @@ async def get_inserate_klaz(browser_manager: PlaywrightManager,
     if radius:
         params['radius'] = radius
 
-    # Optimize: limit page_count for performance
-    if page_count > 5:
-        page_count = 5  # Limit to 5 pages for better performance
+    # Construct the full URL; {page} is filled in per result page
+    return base_url + search_path + ("?" + urlencode(params) if params else "")
 
-    # Construct the full URL and get it
-    search_url = base_url + search_path + ("?" + urlencode(params) if params else "")
 
-    page = await browser_manager.new_context_page()
+async def get_inserate_klaz(browser_manager: PlaywrightManager,
+                            query: str = None,
+                            location: str = None,
+                            radius: int = None,
+                            min_price: int = None,
+                            max_price: int = None,
+                            page_count: int = 1,
+                            engine: str = None):
+    try:
+        results = []
+        async for page_results in iter_inserate_klaz(browser_manager, query, location, radius, min_price,
+                                                     max_price, page_count, engine):
+            results.extend(page_results)
+        return results
+    except HTTPException:
+        # z.B. 503 mit Retry-After, wenn der Browser-Pool ausgelastet ist
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
+
+
+async def iter_inserate_klaz(browser_manager: PlaywrightManager,
+                             query: str = None,
+                             location: str = None,
+                             radius: int = None,
+                             min_price: int = None,
+                             max_price: int = None,
+                             page_count: int = 1,
+                             engine: str = None) -> AsyncIterator[List[dict]]:
+    # Liefert die Anzeigen seitenweise in Seitenreihenfolge, sobald eine Seite geparst ist
+    engine = engine or config.SEARCH_ENGINE
+    base_url = config.BASE_URL
+    search_url = build_search_url(query, location, radius, min_price, max_price)
+
+    seen = set()
+    first_page_results = await _fetch_first_page(browser_manager, search_url, base_url, query, engine)
+    new_ads = _dedupe_ads(seen, first_page_results)
+    if new_ads:
+        yield new_ads
+
+    # Weitere Seiten nur laden, wenn die erste Seite erfolgreich war
+    if first_page_results and page_count > 1:
+        async for page_results in _iter_pages(browser_manager, search_url, range(2, page_count + 1), engine):
+            if not page_results:
+                # Keine weiteren Ergebnisse - Abbrechen
+                break
+            new_ads = _dedupe_ads(seen, page_results)
+            if new_ads:
+                yield new_ads
+
+
+async def _fetch_first_page(browser_manager, search_url: str, base_url: str, query: str = None,
+                            engine: str = "browser", strict: bool = False):
+    first_url = search_url.format(page=1)
+    if engine == "http":
+        http_results = await _try_http(first_url)
+        if http_results is not None:
+            return http_results
+
+    page = await browser_manager.new_context_page("search")
     try:
         # Verbesserte Fehlerbehandlung und Timeouts
         try:
-            # Optimiert: Reduzierte Wartezeit nach Navigation
-            await page.goto(search_url.format(page=1), timeout=45000)
-            await page.wait_for_load_state("domcontentloaded", timeout=30000)
+            async with host_scheduler.navigation(first_url) as navigation:
+                with STAGE_SECONDS.labels("goto", "search").time():
+                    response = await page.goto(first_url, timeout=45000)
+                navigation.status(response.status if response else None)
+                with STAGE_SECONDS.labels("load_state", "search").time():
+                    await page.wait_for_load_state("domcontentloaded", timeout=30000)
         except Exception as e:
             print(f"Navigation error: {str(e)}")
             # Zweiter Versuch mit einfacherer URL
+            FALLBACKS.labels("search_fallback_url").inc()
             fallback_url = f"{base_url}/s-{query if query else ''}"
-            await page.goto(fallback_url, timeout=45000)
-            
-        results = []
+            async with host_scheduler.navigation(fallback_url) as navigation:
+                with STAGE_SECONDS.labels("goto", "search").time():
+                    response = await page.goto(fallback_url, timeout=45000)
+                navigation.status(response.status if response else None)
+
+        return await get_ads(page, strict)
+    finally:
+        await browser_manager.close_page(page)
+
+
+async def _iter_pages(browser_manager, search_url: str, page_numbers, engine: str = "browser"):
+    # Seiten parallel laden, begrenzt durch SEARCH_PAGE_CONCURRENCY; nach der ersten leeren
+    # Seite werden keine höheren Seiten mehr gestartet
+    semaphore = asyncio.Semaphore(config.SEARCH_PAGE_CONCURRENCY)
+    last_page = None
 
-        # Nur die erste Seite scrapen, wenn Probleme auftreten
-        first_page_results = await get_ads(page)
-        results.extend(first_page_results)
-        
-        # Weitere Seiten nur laden, wenn die erste Seite erfolgreich war
-        if first_page_results and page_count > 1:
-            for i in range(1, page_count):
-                try:
-                    next_url = search_url.format(page=i+1)
-                    await page.goto(next_url, timeout=45000)
+    async def fetch(page_number: int):
+        nonlocal last_page
+        async with semaphore:
+            if last_page is not None and page_number > last_page:
+                return []
+            page_results = await _fetch_page(browser_manager, search_url, page_number, engine)
+            if not page_results and (last_page is None or page_number < last_page):
+                last_page = page_number
+            return page_results
+
+    tasks = [asyncio.ensure_future(fetch(page_number)) for page_number in page_numbers]
+    try:
+        # In Seitenreihenfolge ausliefern, während spätere Seiten bereits laden
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _fetch_page(browser_manager, search_url: str, page_number: int, engine: str = "browser",
+                      strict: bool = False):
+    url = search_url.format(page=page_number)
+    page_results = await _try_http(url) if engine == "http" else None
+    if page_results is None:
+        page = await browser_manager.new_context_page("search")
+        try:
+            async with host_scheduler.navigation(url) as navigation:
+                with STAGE_SECONDS.labels("goto", "search").time():
+                    response = await page.goto(url, timeout=45000)
+                navigation.status(response.status if response else None)
+                with STAGE_SECONDS.labels("load_state", "search").time():
                     await page.wait_for_load_state("domcontentloaded", timeout=30000)
-                    
-                    # Kleine Pause zwischen Seitenaufrufen
-                    await asyncio.sleep(1)
-                    
-                    page_results = await get_ads(page)
-                    if page_results:
-                        results.extend(page_results)
-                    else:
-                        # Keine weiteren Ergebnisse - Abbrechen
-                        break
-                except Exception as e:
-                    print(f"Failed to load page {i + 1}: {str(e)}")
-                    break
-        
-        return results
+            page_results = await get_ads(page, strict)
+        except Exception as e:
+            print(f"Failed to load page {page_number}: {str(e)}")
+            if strict:
+                raise
+            page_results = []
+        finally:
+            await browser_manager.close_page(page)
+    return page_results
+
+
+async def get_inserate_page(browser_manager: PlaywrightManager,
+                            page_number: int,
+                            query: str = None,
+                            location: str = None,
+                            radius: int = None,
+                            min_price: int = None,
+                            max_price: int = None,
+                            engine: str = None,
+                            strict: bool = False):
+    # Einzelne Ergebnisseite, z.B. für die Cursor-Paginierung. strict: Lade- und Layoutfehler werfen,
+    # statt eine leere Seite zu liefern, die nicht vom Ende der Ergebnisse zu unterscheiden ist
+    engine = engine or config.SEARCH_ENGINE
+    search_url = build_search_url(query, location, radius, min_price, max_price)
+    try:
+        if page_number == 1:
+            return await _fetch_first_page(browser_manager, search_url, config.BASE_URL, query, engine, strict)
+        return await _fetch_page(browser_manager, search_url, page_number, engine, strict)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
-    finally:
-        await browser_manager.close_page(page)
 
 
-async def get_ads(page):
+async def _try_http(url: str):
+    # None signalisiert dem Aufrufer, auf Playwright zurückzufallen
+    try:
+        return await get_ads_http(url)
+    except Exception as e:
+        print(f"[WARNING] HTTP engine failed for {url}, falling back to browser: {str(e)}")
+        FALLBACKS.labels("http_engine").inc()
+        return None
+
+
+def _dedupe_ads(seen: set, ads: list) -> list:
+    new_ads = []
+    for ad in ads:
+        if ad["adid"] in seen:
+            continue
+        seen.add(ad["adid"])
+        new_ads.append(ad)
+    return new_ads
+
+
+async def get_ads(page, strict: bool = False):
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
     try:
         # Kürzere Timeout für Selector-Queries
-        await page.wait_for_selector(".ad-listitem", timeout=10000, state="attached")
-        
-        items = await page.query_selector_all(".ad-listitem:not(.is-topad):not(.badge-hint-pro-small-srp)")
-        results = []
-        
-        # Limit Anzahl der Items für bessere Performance
-        items = items[:25] if len(items) > 25 else items
-        
-        for item in items:
-            try:
-                article = await item.query_selector("article")
-                if not article:
-                    continue
-                    
-                data_adid = await article.get_attribute("data-adid")
-                data_href = await article.get_attribute("data-href")
-                
-                if not data_adid or not data_href:
-                    continue
-                
-                # Optimierte Selektoren für bessere Performance
-                title_text = ""
-                title_element = await article.query_selector("h2 a")
-                if title_element:
-                    title_text = await title_element.inner_text()
-                
-                price_text = ""
-                price = await article.query_selector("p.aditem-main--middle--price-shipping--price")
-                if price:
-                    price_text = await price.inner_text()
-                    price_text = price_text.replace("€", "").replace("VB", "").replace(".", "").strip()
-                
-                description_text = ""
-                description = await article.query_selector("p.aditem-main--middle--description")
-                if description:
-                    description_text = await description.inner_text()
-                
-                data_href = f"https://www.kleinanzeigen.de{data_href}"
-                results.append({
-                    "adid": data_adid, 
-                    "url": data_href, 
-                    "title": title_text, 
-                    "price": price_text, 
-                    "description": description_text
-                })
-            except Exception as e:
-                print(f"Error parsing ad: {str(e)}")
-                continue
-                
+        try:
+            with STAGE_SECONDS.labels("wait_for_selector", "search").time():
+                await page.wait_for_selector(".ad-listitem", timeout=10000, state="attached")
+        except PlaywrightTimeoutError:
+            SELECTOR_TIMEOUTS.labels(".ad-listitem").inc()
+            html = await page.content()
+            if lib.is_bot_challenge(html):
+                SCRAPE_FAILURES.labels("search", "challenge").inc()
+                session_state.invalidate("challenge")
+                host_scheduler.report(page.url, "challenge")
+            elif lib.is_empty_result_list(html):
+                # Trefferliste ohne Anzeigen, z.B. hinter der letzten Seite: echtes Ende der Ergebnisse
+                return []
+            else:
+                # Geänderte Selektoren: Seite für das spätere Reparsing aufheben
+                await capture_snapshot("search", page.url, html)
+            raise
+
+        if snapshots_enabled():
+            await capture_snapshot("search", page.url, await page.content())
+
+        with EXTRACTION_SECONDS.labels("get_ads").time():
+            results = await _extract_ads(page)
+        persist_ads(results)
         return results
     except Exception as e:
         print(f"Error in get_ads: {str(e)}")
+        if strict:
+            raise
         return []
+
+
+async def _extract_ads(page):
+    items = await page.query_selector_all(lib.AD_LIST_ITEM_SELECTOR)
+    results = []
+    
+    for item in items:
+        try:
+            article = await item.query_selector("article")
+            if not article:
+                continue
+                
+            data_adid = await article.get_attribute("data-adid")
+            data_href = await article.get_attribute("data-href")
+            
+            if not data_adid or not data_href:
+                continue
+            
+            # Optimierte Selektoren für bessere Performance
+            title_text = ""
+            title_element = await article.query_selector("h2 a")
+            if title_element:
+                title_text = await title_element.inner_text()
+            
+            price_text = ""
+            price = await article.query_selector(lib.AD_LIST_PRICE_SELECTOR)
+            if price:
+                price_text = await price.inner_text()
+            
+            location_text = ""
+            location = await article.query_selector(lib.AD_LIST_LOCATION_SELECTOR)
+            if location:
+                location_text = await location.inner_text()
+            
+            description_text = ""
+            description = await article.query_selector("p.aditem-main--middle--description")
+            if description:
+                description_text = await description.inner_text()
+            
+            data_href = f"{config.BASE_URL}{data_href}"
+            results.append(Listing(
+                adid=data_adid,
+                url=data_href,
+                title=title_text,
+                price=lib.clean_list_price(price_text),
+                description=description_text,
+                negotiable=lib.is_negotiable(price_text),
+                location=lib.clean_list_location(location_text)
+            ))
+        except Exception as e:
+            print(f"Error parsing ad: {str(e)}")
+            PARSE_ERRORS.labels("ad_item").inc()
+            continue
+            
+    return results
+
+
+async def get_ads_http(url: str):
+    async with host_scheduler.navigation(url) as navigation:
+        response = await get_http_client().get(url)
+        navigation.status(response.status_code)
+    html = response.text
+    if lib.is_bot_challenge(html):
+        host_scheduler.report(url, "challenge")
+    if response.status_code in (403, 429) or lib.is_bot_challenge(html):
+        raise RuntimeError(f"Bot challenge detected (HTTP {response.status_code})")
+    response.raise_for_status()
+    await capture_snapshot("search", url, html)
+    try:
+        with EXTRACTION_SECONDS.labels("parse_ads_html").time():
+            results = lib.parse_ads_html(html, config.BASE_URL)
+    except ValueError:
+        PARSE_ERRORS.labels("search_list").inc()
+        raise
+    persist_ads(results)
+    return results
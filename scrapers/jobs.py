@@ -0,0 +1,179 @@
+import asyncio
+import multiprocessing
+import signal
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from scrapers.inserat import fetch_inserat
+from scrapers.inserate import SEARCH_PARAMS, get_inserate_page
+from utils import config
+from utils.job_store import JobStore
+
+# Nur vorübergehende Fehler werden wiederholt, 404 nicht
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+async def run_task(browser_manager, task: dict):
+    # Liefert (Ergebnis, stop_after); eine leere Suchseite beendet die Paginierung des Jobs. strict, damit
+    # Lade- und Layoutfehler als Fehler wiederholt werden, statt als leere Seite den Job zu beenden
+    if task["type"] == "search":
+        params = task["params"]
+        ads = await get_inserate_page(browser_manager, task["payload"]["page"], engine=params.get("engine"),
+                                      strict=True, **{name: params.get(name) for name in SEARCH_PARAMS})
+        return ads, not ads
+    return await fetch_inserat(browser_manager, task["payload"]["id"]), False
+
+
+class JobWorker:
+    """Holt Tasks aus der Queue und führt bis zu `concurrency` davon gleichzeitig aus."""
+
+    def __init__(self, store: JobStore, browser_manager, worker_id: str,
+                 concurrency: int = config.JOB_WORKER_CONCURRENCY, poll_interval: float = 0.5):
+        self.store = store
+        self.browser_manager = browser_manager
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._loops: List[asyncio.Task] = []
+        self.completed = 0
+        self.failures = 0
+
+    async def start(self):
+        self._loops = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+
+    async def close(self):
+        for task in self._loops:
+            task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            try:
+                task = await self.store.claim_task(self.worker_id)
+            except Exception as e:
+                print(f"[ERROR] Job worker {self.worker_id} could not claim a task: {str(e)}")
+                task = None
+            if task is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.execute(task)
+
+    async def execute(self, task: dict):
+        try:
+            result, stop_after = await run_task(self.browser_manager, task)
+        except HTTPException as e:
+            self.failures += 1
+            await self.store.fail_task(task, str(e.detail), retry=e.status_code in RETRYABLE_STATUS)
+            return
+        except Exception as e:
+            self.failures += 1
+            await self.store.fail_task(task, str(e), retry=True)
+            return
+        self.completed += 1
+        await self.store.complete_task(task, result, stop_after)
+
+
+def worker_process(worker_id: str):
+    asyncio.run(_worker_main(worker_id))
+
+
+async def _worker_main(worker_id: str):
+    # Eigener Prozess mit eigenem Chromium-Pool; teilt sich mit den anderen nur die SQLite-Queue
+    from utils.ad_store import close_ad_store, open_ad_store
+    from utils.browser_pool import BrowserPool
+    from utils.snapshot_store import close_snapshot_store, open_snapshot_store
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    store = JobStore()
+    pool = BrowserPool()
+    await pool.start()
+    await open_ad_store()
+    open_snapshot_store()
+    worker = JobWorker(store, pool, worker_id)
+    await worker.start()
+    try:
+        await stop.wait()
+    finally:
+        await worker.close()
+        await pool.close()
+        await close_ad_store()
+        close_snapshot_store()
+        await store.close()
+
+
+class JobScheduler:
+    """Verteilt Jobs auf JOB_WORKERS Prozesse oder, bei 0, auf einen Worker im API-Prozess."""
+
+    def __init__(self, store: JobStore, browser_manager, workers: int = config.JOB_WORKERS, tick: float = 5.0):
+        self.store = store
+        self.browser_manager = browser_manager
+        self.workers = workers
+        self.tick = tick
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.Process]] = []
+        self._local: Optional[JobWorker] = None
+        self._task: Optional[asyncio.Task] = None
+        self.restarts = 0
+
+    async def start(self):
+        if self.workers > 0:
+            self._processes = [self._spawn(index) for index in range(self.workers)]
+        else:
+            self._local = JobWorker(self.store, self.browser_manager, "local")
+            await self._local.start()
+        self._task = asyncio.create_task(self._maintenance_loop())
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        process = self._context.Process(target=worker_process, args=(f"worker-{index}",), daemon=True,
+                                        name=f"job-worker-{index}")
+        process.start()
+        return process
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._local:
+            await self._local.close()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            await asyncio.to_thread(process.join, 15)
+            if process.is_alive():
+                process.kill()
+
+    async def _maintenance_loop(self):
+        last_prune = 0.0
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                for index, process in enumerate(self._processes):
+                    if not process.is_alive():
+                        print(f"[WARNING] Job worker {index} exited with {process.exitcode}, restarting")
+                        self._processes[index] = self._spawn(index)
+                        self.restarts += 1
+                requeued = await self.store.requeue_expired()
+                if requeued:
+                    print(f"[WARNING] Requeued {requeued} job tasks with expired leases")
+                now = time.time()
+                if now - last_prune > 3600:
+                    await self.store.prune_jobs(now - config.JOB_RETENTION)
+                    last_prune = now
+            except Exception as e:
+                print(f"[ERROR] Job scheduler: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "mode": "processes" if self.workers > 0 else "in-process",
+            "workers": self.workers or 1,
+            "alive": sum(process.is_alive() for process in self._processes) if self._processes else 1,
+            "restarts": self.restarts,
+            "local_completed": self._local.completed if self._local else None,
+            "local_failures": self._local.failures if self._local else None,
+        }
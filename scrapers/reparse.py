@@ -0,0 +1,186 @@
+"""Re-run the extraction over stored HTML snapshots, without network or browser.
+
+Run from the repository root (snapshots are captured with SNAPSHOTS=1):
+
+    python -m scrapers.reparse [--kind detail|search] [--since-days 7] [--limit 100000] [--workers 8]
+        [--output results.ndjson] [--ad-store]
+    python -m scrapers.reparse --inventory
+
+Every snapshot is parsed in a process pool with the same code the scrapers use (detail pages through
+the Python implementation of DETAIL_SCHEMA). The summary lists failed pages and, per field, how many
+results came back empty, which shows at a glance whether a parser change fixed or broke a field.
+--output writes every result as NDJSON, --ad-store backfills the local ad store (AD_STORE_PATH).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+from libs.websites import kleinanzeigen as lib
+from scrapers.inserat import build_inserat_details
+from utils import config
+from utils.responses import dumps
+from utils.snapshot_store import SnapshotStore, read_snapshot
+
+
+def parse_snapshot(directory: str, entry: tuple) -> dict:
+    # Läuft im Worker-Prozess; Fehler werden als Ergebnis zurückgegeben statt den Lauf abzubrechen
+    digest, kind, url = entry
+    result = {"digest": digest, "kind": kind, "url": url}
+    try:
+        html = read_snapshot(directory, digest)
+        if kind == "detail":
+            record = lib.extract_record_html(html)
+            result["errors"] = record.pop("_errors")
+            result["data"] = build_inserat_details(record, url).to_dict()
+        else:
+            parts = urlsplit(url)
+            ads = lib.parse_ads_html(html, f"{parts.scheme}://{parts.netloc}")
+            result["data"] = [ad.to_dict() for ad in ads]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+    return result
+
+
+def reparse(store: SnapshotStore, kind: Optional[str] = None, since: Optional[float] = None,
+            limit: Optional[int] = None, workers: int = config.REPARSE_WORKERS,
+            chunksize: int = 32) -> Iterator[dict]:
+    parse = partial(parse_snapshot, store.directory)
+    if workers <= 0:
+        # Im eigenen Prozess, z.B. zum Debuggen eines Parsers
+        for entries in store.iter_entries(kind, since, limit):
+            yield from map(parse, entries)
+        return
+    # spawn wie bei den Job-Workern: keine geerbten Threads oder SQLite-Verbindungen
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for entries in store.iter_entries(kind, since, limit, batch_size=workers * chunksize * 4):
+            yield from executor.map(parse, entries, chunksize=chunksize)
+
+
+def _is_empty(value) -> bool:
+    # False ist ein gültiger Wert (z.B. negotiable), "[ERROR] ..." der Platzhalter von build_inserat_details
+    if isinstance(value, bool):
+        return False
+    return not value or (isinstance(value, str) and value.startswith("[ERROR]"))
+
+
+class ReparseSummary:
+    """Zählt Ergebnisse je Seitentyp und leere Felder (auch eine Ebene tief, z.B. location.zip)."""
+
+    def __init__(self):
+        self.pages = Counter()
+        self.failed = Counter()
+        self.empty_pages = 0
+        self.listings = 0
+        self.empty_fields = {"detail": Counter(), "search": Counter()}
+        self.extract_errors = Counter()
+        self.errors = Counter()
+
+    def add(self, result: dict):
+        kind = result["kind"]
+        self.pages[kind] += 1
+        if "error" in result:
+            self.failed[kind] += 1
+            self.errors[result["error"].split(":")[0]] += 1
+            return
+        self.extract_errors.update(result.get("errors") or [])
+        records = [result["data"]] if kind == "detail" else result["data"]
+        if kind == "search":
+            self.listings += len(records)
+            self.empty_pages += not records
+        for record in records:
+            self._count_empty(self.empty_fields[kind], record)
+
+    @staticmethod
+    def _count_empty(counter: Counter, record: dict):
+        for name, value in record.items():
+            if isinstance(value, dict) and value:
+                for sub_name, sub_value in value.items():
+                    if _is_empty(sub_value):
+                        counter[f"{name}.{sub_name}"] += 1
+            elif _is_empty(value):
+                counter[name] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "pages": dict(self.pages),
+            "failed": dict(self.failed),
+            "errors": dict(self.errors),
+            "listings": self.listings,
+            "empty_search_pages": self.empty_pages,
+            "empty_fields": {kind: dict(counter.most_common()) for kind, counter in self.empty_fields.items()
+                             if counter},
+            "extract_errors": dict(self.extract_errors),
+        }
+
+
+async def run(args) -> dict:
+    from utils.ad_store import AdStore
+
+    store = SnapshotStore(args.snapshot_dir)
+    ad_store = AdStore() if args.ad_store else None
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    summary = ReparseSummary()
+    ads, details = [], []
+    started = time.perf_counter()
+    since = time.time() - args.since_days * 86400 if args.since_days else None
+    try:
+        for result in reparse(store, args.kind, since, args.limit, args.workers):
+            summary.add(result)
+            if output:
+                output.write(dumps(result) + "\n")
+            if ad_store and "data" in result:
+                if result["kind"] == "detail":
+                    details.append((result["data"], result["url"]))
+                else:
+                    ads.extend(result["data"])
+                if len(ads) + len(details) >= config.AD_STORE_BATCH_SIZE:
+                    await ad_store.write(ads, details)
+                    ads, details = [], []
+            total = sum(summary.pages.values())
+            if total % 10000 == 0:
+                print(f"{total} pages, {total / (time.perf_counter() - started):.0f}/s", file=sys.stderr)
+        if ad_store and (ads or details):
+            await ad_store.write(ads, details)
+    finally:
+        if output:
+            output.close()
+        if ad_store:
+            await ad_store.close()
+        store.close()
+    seconds = time.perf_counter() - started
+    total = sum(summary.pages.values())
+    return {**summary.to_dict(), "seconds": round(seconds, 2),
+            "pages_per_second": round(total / seconds, 1) if seconds else None}
+
+
+def main(args):
+    if args.inventory:
+        store = SnapshotStore(args.snapshot_dir)
+        try:
+            print(json.dumps(store.inventory(), indent=2))
+        finally:
+            store.close()
+        return
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot-dir", default=config.SNAPSHOT_DIR)
+    parser.add_argument("--kind", choices=("detail", "search"))
+    parser.add_argument("--since-days", type=float)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--workers", type=int, default=config.REPARSE_WORKERS,
+                        help="worker processes, 0 parses in this process")
+    parser.add_argument("--output")
+    parser.add_argument("--ad-store", action="store_true")
+    parser.add_argument("--inventory", action="store_true", help="list stored snapshots per page type and exit")
+    main(parser.parse_args())
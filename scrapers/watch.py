@@ -0,0 +1,144 @@
+import asyncio
+import time
+from typing import Dict, Optional, Set
+
+from scrapers.inserate import SEARCH_PARAMS, get_inserate_page
+from utils import config
+from utils.http_client import get_http_client
+from utils.watch_store import WatchStore
+
+
+async def poll_watch(browser_manager, store: WatchStore, watch: dict) -> int:
+    # Nur neue oder im Preis geänderte Anzeigen werden zu Events; sobald eine Seite
+    # ausschließlich bekannte Anzeigen enthält, wird nicht weiter paginiert
+    params = watch["params"]
+    search_params = {name: params.get(name) for name in SEARCH_PARAMS}
+    initial = not await store.has_seen_any(watch["id"])
+    emitted = 0
+
+    for page_number in range(1, watch["max_pages"] + 1):
+        # strict: eine nicht geladene Seite landet als Fehler in last_error statt als "keine Treffer"
+        ads = await get_inserate_page(browser_manager, page_number, engine=params.get("engine"), strict=True,
+                                      **search_params)
+        if not ads:
+            break
+
+        known = await store.known_prices(watch["id"], [ad["adid"] for ad in ads])
+        events = []
+        for ad in ads:
+            if ad["adid"] not in known:
+                events.append({"type": "new", "ad": ad})
+            elif known[ad["adid"]] != ad.get("price"):
+                events.append({"type": "price_changed", "ad": {**ad, "previous_price": known[ad["adid"]]}})
+
+        if initial and not watch["emit_initial"]:
+            # Erster Lauf baut nur den Index auf
+            events = []
+        await store.record_ads(watch["id"], ads, events)
+        emitted += len(events)
+
+        if not initial and all(ad["adid"] in known for ad in ads):
+            break
+
+    return emitted
+
+
+class WatchScheduler:
+    def __init__(self, store: WatchStore, browser_manager,
+                 concurrency: int = config.WATCH_CONCURRENCY, tick: float = 5.0):
+        self.store = store
+        self.browser_manager = browser_manager
+        self.tick = tick
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_tasks = []
+        self._webhook_backoff: Dict[str, float] = {}
+        self._webhook_failures: Dict[str, int] = {}
+        self.runs = 0
+        self.failures = 0
+        self.events_emitted = 0
+
+    async def start(self):
+        self._loop_tasks = [asyncio.create_task(self._schedule_loop()), asyncio.create_task(self._deliver_loop())]
+
+    async def close(self):
+        for task in [*self._loop_tasks, *self._tasks]:
+            task.cancel()
+        await asyncio.gather(*self._loop_tasks, *self._tasks, return_exceptions=True)
+
+    async def _schedule_loop(self):
+        last_prune = 0.0
+        while True:
+            try:
+                now = time.time()
+                for watch in await self.store.due_watches(now):
+                    if watch["id"] in self._running:
+                        continue
+                    self._running.add(watch["id"])
+                    task = asyncio.create_task(self.run_watch(watch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                if now - last_prune > 3600:
+                    await self.store.prune_events(now - config.WATCH_EVENT_RETENTION)
+                    last_prune = now
+            except Exception as e:
+                print(f"[ERROR] Watch scheduler: {str(e)}")
+            await asyncio.sleep(self.tick)
+
+    async def run_watch(self, watch: dict) -> int:
+        try:
+            async with self._semaphore:
+                started_at = time.time()
+                error: Optional[str] = None
+                emitted = 0
+                try:
+                    emitted = await poll_watch(self.browser_manager, self.store, watch)
+                    self.events_emitted += emitted
+                except Exception as e:
+                    self.failures += 1
+                    error = str(e)
+                    print(f"[ERROR] Watch {watch['id']} failed: {error}")
+                self.runs += 1
+                await self.store.finish_run(watch["id"], started_at, watch["interval_seconds"], error)
+                return emitted
+        finally:
+            self._running.discard(watch["id"])
+
+    async def _deliver_loop(self):
+        while True:
+            try:
+                for watch in await self.store.list_watches():
+                    if watch["webhook_url"] and self._webhook_backoff.get(watch["id"], 0) <= time.time():
+                        await self._deliver(watch)
+            except Exception as e:
+                print(f"[ERROR] Webhook delivery: {str(e)}")
+            await asyncio.sleep(self.tick)
+
+    async def _deliver(self, watch: dict):
+        events = await self.store.events(watch["id"], undelivered=True)
+        if not events:
+            return
+        try:
+            response = await get_http_client().post(watch["webhook_url"],
+                                                    json={"watch_id": watch["id"], "events": events},
+                                                    timeout=config.WATCH_WEBHOOK_TIMEOUT)
+            response.raise_for_status()
+        except Exception as e:
+            # Exponentielles Backoff pro Watch, maximal eine Stunde
+            failures = self._webhook_failures.get(watch["id"], 0) + 1
+            self._webhook_failures[watch["id"]] = failures
+            self._webhook_backoff[watch["id"]] = time.time() + min(3600, 2 ** failures)
+            print(f"[WARNING] Webhook for watch {watch['id']} failed: {str(e)}")
+            return
+        self._webhook_failures.pop(watch["id"], None)
+        self._webhook_backoff.pop(watch["id"], None)
+        await self.store.mark_delivered([event["id"] for event in events])
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._running),
+            "runs": self.runs,
+            "failures": self.failures,
+            "events_emitted": self.events_emitted,
+        }
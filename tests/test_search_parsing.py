@@ -0,0 +1,130 @@
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+
+from libs.websites import kleinanzeigen as lib
+from scrapers import inserate
+
+FIXTURES = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+class FakeBrowserManager:
+    """Zählt nur, ob der Browser-Fallback eine Seite angefordert hat."""
+
+    def __init__(self):
+        self.pages = 0
+
+    async def new_context_page(self, profile: str):
+        self.pages += 1
+        return FakePage()
+
+    async def close_page(self, page):
+        pass
+
+
+class FakePage:
+    url = "about:blank"
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    async def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+
+def mock_http_client(monkeypatch, status: int, html: str):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(status, text=html)))
+    monkeypatch.setattr(inserate, "get_http_client", lambda: client)
+
+
+def test_parse_ads_html_reads_listings():
+    ads = lib.parse_ads_html(fixture("search.html"), "https://www.kleinanzeigen.de")
+
+    assert len(ads) == 25
+    first = ads[0]
+    assert first.adid == "2901234500"
+    assert first.url == "https://www.kleinanzeigen.de/s-anzeige/trekkingrad-28-zoll/2901234500-217-3331"
+    assert first.title == "Trekkingrad 28 Zoll"
+    assert first.price == "1250"
+    assert first.price_value == 1250
+    assert first.negotiable is True
+    assert first.location == "10178 Mitte"
+    assert first.description.startswith("Trekkingrad 28 Zoll in gutem Zustand")
+    assert len({ad.adid for ad in ads}) == len(ads)
+
+
+def test_parse_ads_html_empty_result_list():
+    assert lib.parse_ads_html(fixture("search_empty.html")) == []
+    assert lib.is_empty_result_list(fixture("search_empty.html"))
+    assert not lib.is_empty_result_list(fixture("search.html"))
+
+
+@pytest.mark.parametrize("name", ["detail.html", "challenge.html"])
+def test_parse_ads_html_rejects_pages_without_result_list(name):
+    with pytest.raises(ValueError):
+        lib.parse_ads_html(fixture(name))
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("challenge.html", True),
+    ("search.html", False),
+    ("search_empty.html", False),
+    ("detail.html", False),
+    ("not_found.html", False),
+])
+def test_is_bot_challenge(name, expected):
+    assert lib.is_bot_challenge(fixture(name)) is expected
+
+
+def test_try_http_parses_search_page(monkeypatch):
+    mock_http_client(monkeypatch, 200, fixture("search.html"))
+
+    ads = asyncio.run(inserate._try_http("http://http-ok.test/s-seite:1"))
+
+    assert ads is not None and len(ads) == 25
+
+
+@pytest.mark.parametrize("status, name", [
+    (200, "challenge.html"),
+    (429, "search.html"),
+    (200, "detail.html"),
+    (500, "search.html"),
+])
+def test_try_http_signals_fallback(monkeypatch, status, name):
+    mock_http_client(monkeypatch, status, fixture(name))
+
+    assert asyncio.run(inserate._try_http(f"http://http-fail-{status}.test/s-seite:1")) is None
+
+
+def test_fetch_first_page_uses_http_without_browser(monkeypatch):
+    mock_http_client(monkeypatch, 200, fixture("search.html"))
+    manager = FakeBrowserManager()
+
+    ads = asyncio.run(inserate._fetch_first_page(manager, "http://first-http.test/s-seite:{page}",
+                                                 "http://first-http.test", "fahrrad", "http"))
+
+    assert len(ads) == 25
+    assert manager.pages == 0
+
+
+def test_fetch_first_page_falls_back_to_browser(monkeypatch):
+    mock_http_client(monkeypatch, 200, fixture("challenge.html"))
+    browser_ads = lib.parse_ads_html(fixture("search.html"))[:3]
+
+    async def fake_get_ads(page, strict=False):
+        return browser_ads
+
+    monkeypatch.setattr(inserate, "get_ads", fake_get_ads)
+    manager = FakeBrowserManager()
+
+    ads = asyncio.run(inserate._fetch_first_page(manager, "http://first-fallback.test/s-seite:{page}",
+                                                 "http://first-fallback.test", "fahrrad", "http"))
+
+    assert ads == browser_ads
+    assert manager.pages == 1
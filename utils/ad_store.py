@@ -0,0 +1,386 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from libs.websites.models import Listing, Number, Price, parse_number
+from utils import config
+from utils.responses import dumps
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ads (
+        rowid INTEGER PRIMARY KEY,
+        adid TEXT NOT NULL UNIQUE,
+        url TEXT,
+        title TEXT,
+        description TEXT,
+        price REAL,
+        price_text TEXT,
+        negotiable INTEGER,
+        zip TEXT,
+        city TEXT,
+        state TEXT,
+        category TEXT,
+        categories TEXT,
+        created_at TEXT,
+        has_details INTEGER NOT NULL DEFAULT 0,
+        details TEXT,
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ads_price ON ads (price);
+    CREATE INDEX IF NOT EXISTS ads_zip ON ads (zip);
+    CREATE INDEX IF NOT EXISTS ads_category ON ads (category COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS ads_created_at ON ads (created_at);
+    CREATE INDEX IF NOT EXISTS ads_last_seen ON ads (last_seen);
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS ads_fts USING fts5(
+        title, description, content='ads', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS ads_ai AFTER INSERT ON ads BEGIN
+        INSERT INTO ads_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS ads_ad AFTER DELETE ON ads BEGIN
+        INSERT INTO ads_fts (ads_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS ads_au AFTER UPDATE OF title, description ON ads BEGIN
+        INSERT INTO ads_fts (ads_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO ads_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END;
+"""
+
+# Listeneinträge liefern nur Titel, Kurzbeschreibung, Preis und PLZ; was die Detailseite bereits
+# vollständiger geliefert hat, wird nicht überschrieben
+UPSERT_LIST = """
+    INSERT INTO ads (adid, url, title, description, price, price_text, negotiable, zip, first_seen, last_seen)
+    VALUES (:adid, :url, :title, :description, :price, :price_text, :negotiable, :zip, :now, :now)
+    ON CONFLICT (adid) DO UPDATE SET
+        url = COALESCE(excluded.url, url),
+        title = CASE WHEN has_details THEN title ELSE excluded.title END,
+        description = CASE WHEN has_details THEN description ELSE excluded.description END,
+        price = excluded.price,
+        price_text = excluded.price_text,
+        negotiable = COALESCE(excluded.negotiable, negotiable),
+        zip = CASE WHEN has_details THEN zip ELSE COALESCE(excluded.zip, zip) END,
+        last_seen = excluded.last_seen
+"""
+UPSERT_DETAIL = """
+    INSERT INTO ads (adid, url, title, description, price, price_text, negotiable, zip, city, state, category,
+                     categories, created_at, has_details, details, first_seen, last_seen)
+    VALUES (:adid, :url, :title, :description, :price, :price_text, :negotiable, :zip, :city, :state, :category,
+            :categories, :created_at, 1, :details, :now, :now)
+    ON CONFLICT (adid) DO UPDATE SET
+        url = COALESCE(excluded.url, url),
+        title = excluded.title,
+        description = excluded.description,
+        price = excluded.price,
+        price_text = excluded.price_text,
+        negotiable = excluded.negotiable,
+        zip = excluded.zip,
+        city = excluded.city,
+        state = excluded.state,
+        category = excluded.category,
+        categories = excluded.categories,
+        created_at = COALESCE(excluded.created_at, created_at),
+        has_details = 1,
+        details = excluded.details,
+        last_seen = excluded.last_seen
+"""
+
+
+def listing_price(ad) -> Optional[Number]:
+    # Records bringen den geparsten Wert mit; dicts (z.B. aus dem Reparsing) werden genauso geparst
+    if isinstance(ad, Listing):
+        return ad.price_value
+    return parse_number((ad.get("price") or "").replace(",", "."))
+
+
+def detail_price(price) -> Optional[Number]:
+    # Price.amount ist bereits mit Dezimalpunkt normalisiert ("12,50 €" -> "12.50")
+    if isinstance(price, Price):
+        return price.value
+    return parse_number(price.get("amount"))
+
+
+def listing_zip(location: Optional[str]) -> Optional[str]:
+    # Ortsangabe der Ergebnisliste, z.B. "10178 Mitte"
+    zip_code = (location or "")[:5]
+    return zip_code if len(zip_code) == 5 and zip_code.isdigit() else None
+
+
+def _iso_date(text: Optional[str]) -> Optional[str]:
+    match = re.match(r"(\d{2})\.(\d{2})\.(\d{4})", text or "")
+    return f"{match.group(3)}-{match.group(2)}-{match.group(1)}" if match else None
+
+
+def list_row(ad: dict, now: float) -> dict:
+    # Ältere Einträge (z.B. aus dem Cache) haben noch kein negotiable/location
+    negotiable = ad.get("negotiable")
+    return {
+        "adid": ad["adid"],
+        "url": ad.get("url"),
+        "title": ad.get("title"),
+        "description": ad.get("description"),
+        "price": listing_price(ad),
+        "price_text": ad.get("price"),
+        "negotiable": int(negotiable) if negotiable is not None else None,
+        "zip": listing_zip(ad.get("location")),
+        "now": now,
+    }
+
+
+def detail_row(details: dict, url: Optional[str], now: float) -> dict:
+    price = details.get("price") or {}
+    location = details.get("location") or {}
+    categories = details.get("categories") or []
+    return {
+        "adid": details["id"],
+        "url": url,
+        "title": details.get("title"),
+        "description": details.get("description"),
+        "price": detail_price(price),
+        "price_text": price.get("amount"),
+        "negotiable": int(bool(price.get("negotiable"))),
+        "zip": location.get("zip") or None,
+        "city": location.get("city") or None,
+        "state": location.get("state") or None,
+        "category": categories[-1] if categories else None,
+        "categories": json.dumps(categories, ensure_ascii=False),
+        "created_at": _iso_date((details.get("extra_info") or {}).get("created_at")),
+        "details": dumps(details),
+        "now": now,
+    }
+
+
+def fts_query(text: str) -> Optional[str]:
+    # Freitext in eine sichere FTS5-Abfrage übersetzen: jedes Wort als Präfix, UND-verknüpft
+    tokens = re.findall(r"\w+", text)
+    return " ".join(f'"{token}"*' for token in tokens) if tokens else None
+
+
+class AdStore:
+    """Lokale Ablage aller gescrapten Anzeigen mit Volltext- und Preisindex.
+
+    Schreibzugriffe landen in einer Queue und werden gebündelt in einem Hintergrund-Task
+    geschrieben, damit die Persistenz nie auf dem Latenzpfad einer Anfrage liegt.
+    """
+
+    def __init__(self, path: str = config.AD_STORE_PATH,
+                 batch_size: int = config.AD_STORE_BATCH_SIZE,
+                 flush_interval: float = config.AD_STORE_FLUSH_INTERVAL,
+                 max_queue: int = config.AD_STORE_MAX_QUEUE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._writer: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    async def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer:
+            # Sentinel statt cancel(): der Writer schreibt seinen bereits gesammelten Batch noch weg
+            if not self._writer.done():
+                await self._queue.put(None)
+            await asyncio.gather(self._writer, return_exceptions=True)
+        # Was danach noch in der Queue liegt, nicht verlieren; _drain liefert höchstens batch_size Einträge
+        while not self._queue.empty():
+            await self._flush(self._drain())
+        with self._lock:
+            self._db.close()
+
+    def submit_ads(self, ads: List[dict]):
+        now = time.time()
+        for ad in ads:
+            self._submit(("list", list_row(ad, now)))
+
+    def submit_details(self, details: dict, url: Optional[str] = None):
+        self._submit(("detail", detail_row(details, url, time.time())))
+
+    async def write(self, ads: List[dict], details: List[Tuple[dict, Optional[str]]]):
+        # Direkt in einer Transaktion schreiben statt über die Queue, z.B. beim Backfill aus Snapshots
+        now = time.time()
+        await self._flush([("list", list_row(ad, now)) for ad in ads] +
+                          [("detail", detail_row(record, url, now)) for record, url in details])
+
+    def _submit(self, item: Tuple[str, dict]):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _drain(self) -> List[Tuple[str, dict]]:
+        items = []
+        while not self._queue.empty() and len(items) < self.batch_size:
+            item = self._queue.get_nowait()
+            if item is not None:
+                items.append(item)
+        return items
+
+    async def _write_loop(self):
+        # None in der Queue beendet die Schleife, nachdem der laufende Batch geschrieben ist
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            items = [item]
+            # Kurz sammeln, damit mehrere Seiten in einer Transaktion landen
+            deadline = time.monotonic() + self.flush_interval
+            while len(items) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                items.append(item)
+            try:
+                await self._flush(items)
+            except Exception as e:
+                print(f"[ERROR] Ad store write failed: {str(e)}")
+
+    async def _flush(self, items: List[Tuple[str, dict]]):
+        if not items:
+            return
+        list_rows = [row for kind, row in items if kind == "list"]
+        detail_rows = [row for kind, row in items if kind == "detail"]
+
+        def write():
+            with self._lock:
+                try:
+                    if list_rows:
+                        self._db.executemany(UPSERT_LIST, list_rows)
+                    if detail_rows:
+                        self._db.executemany(UPSERT_DETAIL, detail_rows)
+                    self._db.commit()
+                except Exception:
+                    self._db.rollback()
+                    raise
+
+        await asyncio.to_thread(write)
+        self.written += len(items)
+        self.batches += 1
+
+    async def search(self, text: Optional[str] = None, min_price: Optional[int] = None,
+                     max_price: Optional[int] = None, zip: Optional[str] = None, category: Optional[str] = None,
+                     since: Optional[float] = None, limit: int = 50, offset: int = 0) -> List[dict]:
+        clauses, params = [], []
+        query = "SELECT ads.* FROM ads"
+        match = fts_query(text) if text else None
+        if match:
+            query += " JOIN ads_fts ON ads_fts.rowid = ads.rowid"
+            clauses.append("ads_fts MATCH ?")
+            params.append(match)
+        if min_price is not None:
+            clauses.append("ads.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("ads.price <= ?")
+            params.append(max_price)
+        if zip:
+            # Präfix-Suche nutzt den Index: "10" findet alle Postleitzahlen 10xxx
+            clauses.append("ads.zip >= ? AND ads.zip < ?")
+            params.extend([zip, zip + "￿"])
+        if category:
+            clauses.append("ads.category = ? COLLATE NOCASE")
+            params.append(category)
+        if since is not None:
+            clauses.append("ads.last_seen >= ?")
+            params.append(since)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY ads.last_seen DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        def select():
+            with self._lock:
+                return self._db.execute(query, params).fetchall()
+
+        return [self._ad_dict(row) for row in await asyncio.to_thread(select)]
+
+    @staticmethod
+    def _ad_dict(row: sqlite3.Row) -> dict:
+        return {
+            "adid": row["adid"],
+            "url": row["url"],
+            "title": row["title"],
+            "description": row["description"],
+            "price": row["price"],
+            "price_text": row["price_text"],
+            "negotiable": bool(row["negotiable"]) if row["negotiable"] is not None else None,
+            "location": {"zip": row["zip"], "city": row["city"], "state": row["state"]} if row["zip"] else None,
+            "category": row["category"],
+            "categories": json.loads(row["categories"]) if row["categories"] else [],
+            "created_at": row["created_at"],
+            "has_details": bool(row["has_details"]),
+            "first_seen": row["first_seen"],
+            "last_seen": row["last_seen"],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM ads").fetchone()[0]
+        return {
+            "ads": count,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+
+_store: Optional[AdStore] = None
+
+
+async def open_ad_store() -> Optional[AdStore]:
+    global _store
+    if config.AD_STORE and _store is None:
+        _store = AdStore()
+        await _store.start()
+    return _store
+
+
+async def close_ad_store():
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
+
+
+def persist_ads(ads: List[dict]):
+    # No-op, solange der Store nicht aktiviert ist
+    if _store is not None and ads:
+        _store.submit_ads(ads)
+
+
+def persist_details(details: dict, url: Optional[str] = None):
+    if _store is not None and details:
+        _store.submit_details(details, url)
+
+
+def get_ad_store(request: Request) -> AdStore:
+    store = getattr(request.app.state, "ad_store", None)
+    if store is None:
+        raise HTTPException(status_code=503, detail="Der Anzeigen-Store ist deaktiviert (AD_STORE=1 setzen)")
+    return store
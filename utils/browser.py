@@ -1,55 +1,94 @@
-from playwright.async_api import async_playwright
+from utils import config
+from utils.metrics import STAGE_SECONDS
 
 def get_random_ua():
     # Einen festen modernen User-Agent zurückgeben, da random hier nicht nötig ist
     return 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
 class PlaywrightManager:
-    def __init__(self):
-        self._playwright = None
+    def __init__(self, playwright=None, resource_blocker=None, max_contexts: int = config.BROWSER_MAX_CONTEXTS):
+        # Eine geteilte Playwright-Instanz (z.B. aus dem BrowserPool) wird nicht von uns gestoppt
+        self._playwright = playwright
+        self._owns_playwright = playwright is None
         self._browser = None
-        
+        self.resource_blocker = resource_blocker
+        # Offene Kontexte; jeder hält eigene Cookies, Caches und Renderer-Speicher
+        self.max_contexts = max_contexts
+        self._contexts = set()
+        self.contexts_created = 0
+
+    def is_connected(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
     async def start(self):
-        from playwright.async_api import async_playwright
-        self._playwright = await async_playwright().start()
+        if self._playwright is None:
+            # Playwright erst beim Start laden, nicht schon beim Import der Router
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
         # Browser-Launch optimieren mit reduzierten Ressourcen
-        self._browser = await self._playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-gpu',                
-                '--disable-dev-shm-usage',
-                '--disable-setuid-sandbox',
-                '--no-sandbox',
-                '--single-process',
-                '--disable-extensions',
-            ]
-        )
+        with STAGE_SECONDS.labels("browser_launch", "").time():
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=[
+                    '--disable-gpu',
+                    '--disable-dev-shm-usage',
+                    '--disable-setuid-sandbox',
+                    '--no-sandbox',
+                    '--single-process',
+                    '--disable-extensions',
+                ]
+            )
         
-    async def new_context_page(self):
+    async def new_context(self, storage_state=None):
         if not self._browser:
             await self.start()
-            
-        # Optimierte Kontext-Einstellungen
-        context = await self._browser.new_context(
-            viewport={'width': 1280, 'height': 720},
-            user_agent=get_random_ua(),
-            java_script_enabled=True,
-            is_mobile=False,
-            locale='de-DE',
-        )
-        
-        page = await context.new_page()
+        if self.max_contexts and len(self._contexts) >= self.max_contexts:
+            raise RuntimeError(f"Limit of {self.max_contexts} open browser contexts reached")
+
+        # Optimierte Kontext-Einstellungen; storage_state übernimmt Consent und Cookies der Vorwärmung
+        with STAGE_SECONDS.labels("context_create", "").time():
+            context = await self._browser.new_context(
+                viewport={'width': 1280, 'height': 720},
+                user_agent=get_random_ua(),
+                java_script_enabled=True,
+                is_mobile=False,
+                locale='de-DE',
+                storage_state=storage_state,
+            )
+        self._contexts.add(context)
+        self.contexts_created += 1
+        context.on("close", self._contexts.discard)
+        return context
+
+    async def new_context_page(self, profile=None, storage_state=None):
+        context = await self.new_context(storage_state)
+        try:
+            if self.resource_blocker:
+                # Bilder, Fonts, Medien und Tracker bereits auf Kontext-Ebene abbrechen
+                await self.resource_blocker.attach(context, profile)
+            page = await context.new_page()
+        except:
+            await context.close()
+            raise
         # Längere Timeouts für instabile Verbindungen
         page.set_default_timeout(60000)
         page.set_default_navigation_timeout(60000)
         return page
         
     async def close_page(self, page):
+        # Jede Seite hat ihren eigenen Kontext; nur die Seite zu schließen ließe ihn offen
         if page:
             try:
-                await page.close()
+                await page.context.close()
             except:
                 pass
+
+    def stats(self) -> dict:
+        return {
+            "contexts": len(self._contexts),
+            "pages": sum(len(context.pages) for context in self._contexts),
+            "contexts_created": self.contexts_created,
+        }
          
     async def close(self):
         if self._browser:
@@ -57,7 +96,7 @@ class PlaywrightManager:
                 await self._browser.close()
             except:
                 pass
-        if self._playwright:
+        if self._playwright and self._owns_playwright:
             try:
                 await self._playwright.stop()
             except:
@@ -0,0 +1,416 @@
+import asyncio
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException, Request
+
+from utils import config
+from utils.browser import PlaywrightManager
+from utils.memory_governor import MemoryGovernor, chromium_pids, process_table
+from utils.resource_blocking import ResourceBlocker
+from utils.session import SessionState, session_state
+
+
+class _BrowserSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.manager: Optional[PlaywrightManager] = None
+        self.pages: List = []
+        self.root_pid: Optional[int] = None
+        self.uses = 0
+        self.in_use = 0
+        self.generation = 0
+        self.retiring = False
+        self.retiring_since: Optional[float] = None
+        self.retire_reason: Optional[str] = None
+        self.recycling = False
+        self.rss: Optional[int] = None
+        self.peak_rss = 0
+
+
+class BrowserPool:
+    """N warme Chromium-Instanzen mit je M wiederverwendbaren Seiten.
+
+    Bietet dieselbe Schnittstelle wie PlaywrightManager (new_context_page/close_page),
+    sodass die Scraper unverändert mit dem Pool arbeiten können.
+    """
+
+    def __init__(self,
+                 size: int = config.BROWSER_POOL_SIZE,
+                 pages_per_browser: int = config.BROWSER_POOL_PAGES,
+                 max_uses: int = config.BROWSER_MAX_USES,
+                 max_rss_mb: int = config.BROWSER_MAX_RSS_MB,
+                 acquire_timeout: float = config.BROWSER_ACQUIRE_TIMEOUT,
+                 max_waiting: int = config.BROWSER_MAX_WAITING,
+                 health_interval: float = config.BROWSER_HEALTH_INTERVAL,
+                 context_max_uses: int = config.BROWSER_CONTEXT_MAX_USES,
+                 resource_blocker: Optional[ResourceBlocker] = None,
+                 session: Optional[SessionState] = None,
+                 governor: Optional[MemoryGovernor] = None):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.max_uses = max_uses
+        self.context_max_uses = context_max_uses
+        self.governor = governor if governor is not None else MemoryGovernor(max_rss_mb=max_rss_mb)
+        self.acquire_timeout = acquire_timeout
+        self.max_waiting = max_waiting
+        self.health_interval = health_interval
+        if resource_blocker is None and config.RESOURCE_BLOCKING:
+            resource_blocker = ResourceBlocker()
+        self.resource_blocker = resource_blocker
+        if session is None and config.SESSION_WARMUP:
+            session = session_state
+        self.session = session
+
+        self._playwright = None
+        self._slots: List[_BrowserSlot] = []
+        self._owner: Dict = {}
+        self._session_generation: Dict = {}
+        self._page_uses: Dict = {}
+        self._session_task: Optional[asyncio.Task] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._launch_lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+        self._waiting = 0
+        self._closed = False
+        self._start_task: Optional[asyncio.Task] = None
+        self.state = "idle"
+        self.startup_seconds: Optional[float] = None
+        self.acquire_timeouts = 0
+        self.rejected = 0
+        self.recycles = 0
+        self.recycle_reasons = Counter()
+        self.context_replacements = 0
+
+    def prewarm(self):
+        # Startet den Pool im Hintergrund; Anfragen warten in new_context_page, bis er bereit ist
+        if self._start_task is None:
+            self._start_task = asyncio.create_task(self._start())
+            self._start_task.add_done_callback(self._start_done)
+
+    def _start_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[ERROR] Browser pool start failed: {str(task.exception())}")
+            # Der nächste Aufruf versucht es erneut
+            self._start_task = None
+
+    async def start(self):
+        # Mehrere gleichzeitige Aufrufer teilen sich denselben Start
+        self.prewarm()
+        await asyncio.shield(self._start_task)
+
+    async def _start(self):
+        from playwright.async_api import async_playwright
+
+        self.state = "starting"
+        started = time.monotonic()
+        try:
+            self._playwright = await async_playwright().start()
+            self._idle = asyncio.Queue()
+            self._slots = [_BrowserSlot(i) for i in range(self.size)]
+            await asyncio.gather(*(self._launch(slot) for slot in self._slots))
+        except BaseException:
+            self.state = "failed"
+            await self._shutdown()
+            raise
+        self._health_task = asyncio.create_task(self._health_loop())
+        self.startup_seconds = round(time.monotonic() - started, 3)
+        self.state = "ready"
+
+    async def close(self):
+        self._closed = True
+        if self._start_task and not self._start_task.done():
+            self._start_task.cancel()
+            await asyncio.gather(self._start_task, return_exceptions=True)
+        if self._health_task:
+            self._health_task.cancel()
+        for task in list(self._background):
+            task.cancel()
+        await self._shutdown()
+
+    async def _shutdown(self):
+        for slot in self._slots:
+            if slot.manager:
+                await slot.manager.close()
+        if self._playwright:
+            try:
+                await self._playwright.stop()
+            except:
+                pass
+        self._slots = []
+        self._owner.clear()
+        self._session_generation.clear()
+        self._page_uses.clear()
+        self._playwright = None
+
+    async def _launch(self, slot: _BrowserSlot):
+        # Launches serialisieren, damit sich neue Chromium-Prozesse eindeutig zuordnen lassen
+        async with self._launch_lock:
+            before = chromium_pids(process_table())
+            manager = PlaywrightManager(self._playwright, self.resource_blocker)
+            await manager.start()
+            table = process_table()
+            new_pids = chromium_pids(table) - before
+            roots = [pid for pid in new_pids if table[pid][0] not in new_pids]
+            slot.root_pid = roots[0] if len(roots) == 1 else None
+
+        storage_state = None
+        if self.session:
+            # Der erste Launch wärmt die Sitzung auf, alle weiteren Kontexte übernehmen sie
+            storage_state = await self.session.refresh(manager) if self.session.needs_refresh() else self.session.state
+        slot.manager = manager
+        slot.pages = [await manager.new_context_page(storage_state=storage_state)
+                      for _ in range(self.pages_per_browser)]
+        slot.uses = 0
+        slot.rss = None
+        slot.generation += 1
+        slot.retiring = False
+        slot.retiring_since = None
+        slot.retire_reason = None
+        for page in slot.pages:
+            self._owner[page] = slot
+            if storage_state is not None:
+                self._session_generation[page] = self.session.generation
+            self._idle.put_nowait(page)
+
+    async def _recycle(self, slot: _BrowserSlot):
+        if slot.recycling or self._closed:
+            return
+        slot.recycling = True
+        try:
+            slot.retiring = True
+            for page in slot.pages:
+                self._forget(page)
+            slot.pages = []
+            # Vergessene Seiten senken in_use nicht mehr; auch wenn der Neustart scheitert, muss der
+            # Health-Loop den Slot wieder recyceln können
+            slot.in_use = 0
+            if slot.manager:
+                await slot.manager.close()
+            slot.manager = None
+            self.recycles += 1
+            self.recycle_reasons[slot.retire_reason or "unknown"] += 1
+            await self._launch(slot)
+        except Exception as e:
+            print(f"[ERROR] Browser recycle failed: {str(e)}")
+        finally:
+            slot.recycling = False
+
+    def _forget(self, page):
+        self._owner.pop(page, None)
+        self._session_generation.pop(page, None)
+        self._page_uses.pop(page, None)
+
+    def _run_background(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def _schedule_recycle(self, slot: _BrowserSlot, reason: str):
+        # Erst neu starten, wenn alle ausgegebenen Seiten zurück sind (Drain)
+        if not slot.retiring:
+            slot.retiring = True
+            slot.retiring_since = time.monotonic()
+            slot.retire_reason = reason
+        if slot.in_use == 0 and not slot.recycling:
+            self._run_background(self._recycle(slot))
+
+    def _force_recycle(self, slot: _BrowserSlot):
+        # Hängende Anfragen verlieren ihre Seite; ihr close_page läuft dann ins Leere.
+        # in_use setzt erst _recycle zurück, nachdem es die Seiten vergessen hat
+        print(f"[WARNING] Browser {slot.index} still has {slot.in_use} pages in use after "
+              f"{self.governor.drain_timeout:.0f}s, recycling anyway")
+        slot.retire_reason = "drain_timeout"
+        if not slot.recycling:
+            self._run_background(self._recycle(slot))
+
+    async def _replace_context(self, slot: _BrowserSlot, page):
+        # Einen einzelnen verbrauchten oder abgestürzten Kontext ersetzen, statt den ganzen Browser
+        self._forget(page)
+        if page in slot.pages:
+            slot.pages.remove(page)
+        generation = slot.generation
+        try:
+            await page.context.close()
+        except:
+            pass
+        if slot.retiring or slot.manager is None:
+            return
+        storage_state = self.session.state if self.session else None
+        try:
+            new_page = await slot.manager.new_context_page(storage_state=storage_state)
+        except Exception as e:
+            print(f"[ERROR] Could not replace browser context: {str(e)}")
+            self._schedule_recycle(slot, "context_error")
+            return
+        if slot.generation != generation or slot.retiring or self._closed:
+            try:
+                await new_page.context.close()
+            except:
+                pass
+            return
+        slot.pages.append(new_page)
+        self._owner[new_page] = slot
+        if storage_state is not None:
+            self._session_generation[new_page] = self.session.generation
+        self.context_replacements += 1
+        self._idle.put_nowait(new_page)
+
+    def _schedule_session_refresh(self, slot: _BrowserSlot):
+        # Im Hintergrund, damit Anfragen nicht auf die Vorwärmung warten; sie nutzen bis dahin den alten Zustand
+        if self._session_task is not None and not self._session_task.done():
+            return
+        if slot.manager is None or not slot.manager.is_connected():
+            return
+        self._session_task = self._run_background(self.session.refresh(slot.manager))
+
+    async def _sync_session(self, page, slot: _BrowserSlot):
+        if self.session.needs_refresh():
+            self._schedule_session_refresh(slot)
+        if self.session.state is None or self._session_generation.get(page) == self.session.generation:
+            return
+        try:
+            await self.session.apply(page.context)
+            self._session_generation[page] = self.session.generation
+        except Exception as e:
+            print(f"[WARNING] Could not apply session state: {str(e)}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                self.governor.sample(self._slots)
+                for slot in self._slots:
+                    if slot.recycling:
+                        continue
+                    if slot.manager is None or not slot.manager.is_connected():
+                        self._schedule_recycle(slot, "disconnected")
+                    elif slot.retiring:
+                        if self.governor.drain_expired(slot):
+                            self._force_recycle(slot)
+                        else:
+                            self._schedule_recycle(slot, slot.retire_reason)
+                    elif self.governor.over_limit(slot):
+                        self._schedule_recycle(slot, "rss")
+                    elif self.session and self.session.needs_refresh():
+                        self._schedule_session_refresh(slot)
+                largest = self.governor.over_total(self._slots)
+                if largest is not None:
+                    self._schedule_recycle(largest, "total_rss")
+            except Exception as e:
+                print(f"[ERROR] Browser health check failed: {str(e)}")
+
+    async def new_context_page(self, profile: Optional[str] = None):
+        if self._waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Zu viele wartende Anfragen, bitte später erneut versuchen",
+                                headers={"Retry-After": "5"})
+        self._waiting += 1
+        try:
+            if self.state != "ready":
+                # Kaltstart ohne Vorwärmen: der erste Browser-Zugriff startet den Pool
+                try:
+                    await self.start()
+                except Exception as e:
+                    raise HTTPException(status_code=503, detail=f"Browser konnte nicht gestartet werden: {str(e)}",
+                                        headers={"Retry-After": "5"})
+            deadline = time.monotonic() + self.acquire_timeout
+            while True:
+                page = await asyncio.wait_for(self._idle.get(), timeout=max(deadline - time.monotonic(), 0))
+                slot = self._owner.get(page)
+                if slot is None or slot.retiring:
+                    # Veraltete Seite eines recycelten Browsers
+                    continue
+                if not slot.manager.is_connected():
+                    self._schedule_recycle(slot, "disconnected")
+                    continue
+                if page.is_closed():
+                    self._run_background(self._replace_context(slot, page))
+                    continue
+                if self.session:
+                    try:
+                        await self._sync_session(page, slot)
+                    except asyncio.CancelledError:
+                        self._idle.put_nowait(page)
+                        raise
+                slot.in_use += 1
+                if self.resource_blocker:
+                    self.resource_blocker.set_profile(page.context, profile)
+                return page
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise HTTPException(status_code=503, detail="Alle Browser sind ausgelastet, bitte später erneut versuchen",
+                                headers={"Retry-After": "5"})
+        finally:
+            self._waiting -= 1
+
+    async def close_page(self, page):
+        slot = self._owner.get(page)
+        if slot is None:
+            # Nicht (mehr) vom Pool verwaltet; mit der Seite auch ihren Kontext schließen
+            try:
+                await page.context.close()
+            except:
+                pass
+            return
+        slot.in_use -= 1
+        slot.uses += 1
+        self._page_uses[page] = self._page_uses.get(page, 0) + 1
+        if self.max_uses and slot.uses >= self.max_uses:
+            self._schedule_recycle(slot, "max_uses")
+        if slot.retiring:
+            self._schedule_recycle(slot, slot.retire_reason)
+            return
+        if self.context_max_uses and self._page_uses[page] >= self.context_max_uses:
+            self._run_background(self._replace_context(slot, page))
+            return
+        self._idle.put_nowait(page)
+
+    @asynccontextmanager
+    async def page(self, profile: Optional[str] = None):
+        page = await self.new_context_page(profile)
+        try:
+            yield page
+        finally:
+            await self.close_page(page)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "startup_seconds": self.startup_seconds,
+            "size": self.size,
+            "pages_per_browser": self.pages_per_browser,
+            "in_use": sum(slot.in_use for slot in self._slots),
+            "waiting": self._waiting,
+            "acquire_timeouts": self.acquire_timeouts,
+            "rejected": self.rejected,
+            "recycles": self.recycles,
+            "recycle_reasons": dict(self.recycle_reasons),
+            "context_replacements": self.context_replacements,
+            "context_max_uses": self.context_max_uses,
+            "memory": self.governor.stats(),
+            "session": self.session.stats() if self.session else None,
+            "browsers": [
+                {
+                    "index": slot.index,
+                    "generation": slot.generation,
+                    "connected": bool(slot.manager and slot.manager.is_connected()),
+                    "uses": slot.uses,
+                    "in_use": slot.in_use,
+                    "retiring": slot.retiring,
+                    "retire_reason": slot.retire_reason,
+                    **(slot.manager.stats() if slot.manager else {"contexts": 0, "pages": 0, "contexts_created": 0}),
+                    "rss_mb": round(slot.rss / 1024 / 1024, 1) if slot.rss else None,
+                    "peak_rss_mb": round(slot.peak_rss / 1024 / 1024, 1) if slot.peak_rss else None,
+                }
+                for slot in self._slots
+            ],
+        }
+
+
+def get_browser_pool(request: Request) -> BrowserPool:
+    return request.app.state.browser_pool
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from utils import config
+from utils.responses import dumps
+
+CACHE_NAME = "kleinanzeigen-api"
+
+
+def make_cache_key(endpoint: str, **params) -> str:
+    # Parameter normalisieren, damit gleichwertige Anfragen denselben Eintrag treffen
+    normalized = []
+    for name in sorted(params):
+        value = params[name]
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.lower().split())
+        normalized.append(f"{name}={value}")
+    return f"{endpoint}?" + "&".join(normalized)
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = config.CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2], now - entry[0]
+
+    async def set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+        self._entries[key] = (now, now + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SQLiteCache:
+    def __init__(self, path: str = config.CACHE_PATH, max_entries: int = config.CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                value TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: str) -> Optional[Tuple[Any, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT stored_at, value FROM cache WHERE key = ? AND expires_at > ?",
+                                   (key, now)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return json.loads(row[1]), now - row[0]
+
+    def _set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                             (key, now, now + ttl, now, dumps(value)))
+            self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._db.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        result = await asyncio.to_thread(self._get, key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"backend": "sqlite", "entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+def create_cache():
+    if config.CACHE_BACKEND == "sqlite":
+        return SQLiteCache()
+    return MemoryCache()
+
+
+def get_response_cache(request: Request):
+    return request.app.state.response_cache
+
+
+def cache_directives(request: Request) -> Tuple[bool, bool]:
+    # Liefert (bypass, store): no-cache und no-store lesen nicht aus dem Cache, no-store schreibt auch nicht hinein
+    cache_control = request.headers.get("cache-control", "").lower()
+    store = "no-store" not in cache_control
+    return "no-cache" in cache_control or not store, store
+
+
+async def cached_call(cache, key: str, ttl: float, producer: Callable[[], Awaitable[Any]],
+                      bypass: bool = False, store: bool = True) -> Tuple[Any, Optional[float]]:
+    # Liefert (Wert, Alter in Sekunden); das Alter ist None, wenn frisch gescrapt wurde
+    if ttl > 0 and not bypass:
+        cached = await cache.get(key)
+        if cached is not None:
+            return cached
+
+    value = await producer()
+    # Leere Ergebnisse entstehen oft durch Fehler beim Scrapen und werden nicht gespeichert
+    if ttl > 0 and store and value:
+        await cache.set(key, value, ttl)
+    return value, None
+
+
+async def cached_response(cache, request: Request, response: Response, key: str, ttl: float,
+                          producer: Callable[[], Awaitable[Any]]) -> Any:
+    bypass, store = cache_directives(request)
+    value, age = await cached_call(cache, key, ttl, producer, bypass=bypass, store=store)
+    if age is not None:
+        response.headers["Cache-Status"] = f"{CACHE_NAME}; hit; ttl={int(ttl - age)}"
+        response.headers["Age"] = str(int(age))
+    else:
+        stored = ttl > 0 and store and bool(value)
+        response.headers["Cache-Status"] = f"{CACHE_NAME}; fwd={'request' if bypass else 'miss'}" + ("; stored" if stored else "")
+        response.headers["Age"] = "0"
+    return value
@@ -0,0 +1,139 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_list(name: str, default: str) -> list:
+    return [item.strip() for item in os.environ.get(name, default).split(",") if item.strip()]
+
+
+# Verzeichnis für persistente Daten (auf Render als Disk unter /data gemountet)
+DATA_DIR = os.environ.get("DATA_DIR", "/data" if os.path.isdir("/data") else ".")
+
+# Basis-URL der Website; für Benchmarks auf einen lokalen Stand-in-Server umstellbar
+BASE_URL = os.environ.get("KLEINANZEIGEN_BASE_URL", "https://www.kleinanzeigen.de").rstrip("/")
+
+# Browser-Pool
+BROWSER_POOL_SIZE = _env_int("BROWSER_POOL_SIZE", 1)
+BROWSER_POOL_PAGES = _env_int("BROWSER_POOL_PAGES", 4)
+BROWSER_MAX_USES = _env_int("BROWSER_MAX_USES", 200)
+BROWSER_MAX_RSS_MB = _env_int("BROWSER_MAX_RSS_MB", 768)
+BROWSER_ACQUIRE_TIMEOUT = _env_float("BROWSER_ACQUIRE_TIMEOUT", 30.0)
+BROWSER_MAX_WAITING = _env_int("BROWSER_MAX_WAITING", 100)
+BROWSER_HEALTH_INTERVAL = _env_float("BROWSER_HEALTH_INTERVAL", 15.0)
+# Speichergrenzen: Summe aller Chromium-Instanzen (0 = aus), Wartezeit auf laufende Anfragen vor dem Recyceln
+BROWSER_MAX_TOTAL_RSS_MB = _env_int("BROWSER_MAX_TOTAL_RSS_MB", 0)
+BROWSER_DRAIN_TIMEOUT = _env_float("BROWSER_DRAIN_TIMEOUT", 60.0)
+# Offene Kontexte pro Browser (Pool-Seiten plus Vorwärmung und Austausch) und Nutzungen pro Kontext
+BROWSER_MAX_CONTEXTS = _env_int("BROWSER_MAX_CONTEXTS", BROWSER_POOL_PAGES + 2)
+BROWSER_CONTEXT_MAX_USES = _env_int("BROWSER_CONTEXT_MAX_USES", 50)
+# "eager": Start wartet auf den Pool, "background": Pool startet im Hintergrund,
+# "lazy": erst die erste Anfrage, die einen Browser braucht, startet ihn
+BROWSER_STARTUP = os.environ.get("BROWSER_STARTUP", "eager")
+
+# Vorgewärmter Sitzungszustand (Consent, Cookies), den alle Browser-Kontexte teilen
+SESSION_WARMUP = os.environ.get("SESSION_WARMUP", "1") != "0"
+SESSION_STATE_PATH = os.environ.get("SESSION_STATE_PATH", os.path.join(DATA_DIR, "session_state.json"))
+SESSION_TTL = _env_int("SESSION_TTL", 6 * 3600)
+SESSION_MIN_REFRESH_INTERVAL = _env_float("SESSION_MIN_REFRESH_INTERVAL", 60.0)
+
+# Zeitbudget pro Detailabruf in Sekunden, inklusive Fallback-URL
+DETAIL_DEADLINE = _env_float("DETAIL_DEADLINE", 25.0)
+
+# Suche
+SEARCH_PAGE_CONCURRENCY = _env_int("SEARCH_PAGE_CONCURRENCY", 3)
+# "browser" (Playwright) oder "http" (ohne Browser, mit Fallback auf Playwright)
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "browser")
+
+# HTTP-Client für die browserlose Suche
+HTTP_TIMEOUT = _env_float("HTTP_TIMEOUT", 15.0)
+HTTP_MAX_CONNECTIONS = _env_int("HTTP_MAX_CONNECTIONS", 20)
+
+# Rate-Limit pro Host (Anfragen pro Sekunde, 0 = unbegrenzt)
+HOST_RATE_LIMIT = _env_float("HOST_RATE_LIMIT", 2.0)
+HOST_RATE_BURST = _env_int("HOST_RATE_BURST", 4)
+
+# Adaptive Parallelität pro Host (AIMD) für alle Navigationen
+NAV_CONCURRENCY_INITIAL = _env_int("NAV_CONCURRENCY_INITIAL", 4)
+NAV_CONCURRENCY_MIN = _env_int("NAV_CONCURRENCY_MIN", 1)
+NAV_CONCURRENCY_MAX = _env_int("NAV_CONCURRENCY_MAX", 16)
+NAV_LATENCY_TARGET = _env_float("NAV_LATENCY_TARGET", 3.0)
+NAV_SUCCESS_TARGET = _env_float("NAV_SUCCESS_TARGET", 0.9)
+NAV_BACKOFF = _env_float("NAV_BACKOFF", 0.5)
+NAV_BACKOFF_COOLDOWN = _env_float("NAV_BACKOFF_COOLDOWN", 2.0)
+
+# Blockieren von Bildern, Fonts, Medien und Trackern (kommagetrennte Listen)
+RESOURCE_BLOCKING = os.environ.get("RESOURCE_BLOCKING", "1") != "0"
+BLOCK_RESOURCE_TYPES_SEARCH = _env_list("BLOCK_RESOURCE_TYPES_SEARCH", "image,media,font,imageset,texttrack,manifest")
+BLOCK_RESOURCE_TYPES_DETAIL = _env_list("BLOCK_RESOURCE_TYPES_DETAIL", "image,media,font,imageset,texttrack,manifest")
+BLOCK_DOMAINS = _env_list("BLOCK_DOMAINS", ",".join([
+    "googletagmanager.com", "google-analytics.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "adservice.google.com", "adnxs.com", "criteo.com", "criteo.net",
+    "facebook.net", "facebook.com", "hotjar.com", "consensu.org", "privacy-mgmt.com",
+    "sourcepoint.com", "amazon-adsystem.com", "taboola.com", "outbrain.com", "ioam.de",
+]))
+ALLOW_DOMAINS = _env_list("ALLOW_DOMAINS", "kleinanzeigen.de,ebay-kleinanzeigen.de")
+BLOCK_THIRD_PARTY_SCRIPTS = os.environ.get("BLOCK_THIRD_PARTY_SCRIPTS", "1") != "0"
+
+# Antwort-Cache (TTL in Sekunden, 0 = nicht cachen)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")  # "memory" oder "sqlite"
+CACHE_PATH = os.environ.get("CACHE_PATH", os.path.join(DATA_DIR, "cache.sqlite3"))
+CACHE_MAX_ENTRIES = _env_int("CACHE_MAX_ENTRIES", 1000)
+CACHE_TTL_SEARCH = _env_int("CACHE_TTL_SEARCH", 300)
+CACHE_TTL_DETAIL = _env_int("CACHE_TTL_DETAIL", 3600)
+
+# Batch-Abruf von Inseraten
+BATCH_MAX_IDS = _env_int("BATCH_MAX_IDS", 500)
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", 4)
+BATCH_MAX_CONCURRENCY = _env_int("BATCH_MAX_CONCURRENCY", 16)
+
+# Anreicherung der Suchergebnisse mit Detailseiten (/inserate?enrich=true)
+ENRICH_CONCURRENCY = _env_int("ENRICH_CONCURRENCY", 4)
+ENRICH_MAX_CONCURRENCY = _env_int("ENRICH_MAX_CONCURRENCY", 16)
+ENRICH_TIMEOUT = _env_float("ENRICH_TIMEOUT", 15.0)
+
+# Cursor-Paginierung: nächste Seite im Hintergrund vorladen
+CURSOR_PREFETCH = os.environ.get("CURSOR_PREFETCH", "1") != "0"
+
+# Lokaler Anzeigen-Store mit Volltextindex (standardmäßig aus)
+AD_STORE = os.environ.get("AD_STORE", "0") != "0"
+AD_STORE_PATH = os.environ.get("AD_STORE_PATH", os.path.join(DATA_DIR, "ads.sqlite3"))
+AD_STORE_BATCH_SIZE = _env_int("AD_STORE_BATCH_SIZE", 500)
+AD_STORE_FLUSH_INTERVAL = _env_float("AD_STORE_FLUSH_INTERVAL", 1.0)
+AD_STORE_MAX_QUEUE = _env_int("AD_STORE_MAX_QUEUE", 20000)
+
+# HTML-Snapshots aller gescrapten Seiten für das Offline-Reparsing (standardmäßig aus)
+SNAPSHOTS = os.environ.get("SNAPSHOTS", "0") != "0"
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+SNAPSHOT_COMPRESSION = _env_int("SNAPSHOT_COMPRESSION", 6)
+REPARSE_WORKERS = _env_int("REPARSE_WORKERS", os.cpu_count() or 1)
+
+# Hintergrund-Jobs (0 Worker = im API-Prozess mit dem gemeinsamen Browser-Pool)
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+JOB_WORKERS = _env_int("JOB_WORKERS", 0)
+JOB_WORKER_CONCURRENCY = _env_int("JOB_WORKER_CONCURRENCY", BROWSER_POOL_SIZE * BROWSER_POOL_PAGES)
+JOB_DEFAULT_CONCURRENCY = _env_int("JOB_DEFAULT_CONCURRENCY", 4)
+JOB_MAX_CONCURRENCY = _env_int("JOB_MAX_CONCURRENCY", 32)
+JOB_MAX_PAGES = _env_int("JOB_MAX_PAGES", 100)
+JOB_MAX_IDS = _env_int("JOB_MAX_IDS", 5000)
+JOB_MAX_ATTEMPTS = _env_int("JOB_MAX_ATTEMPTS", 3)
+JOB_RETRY_BACKOFF = _env_float("JOB_RETRY_BACKOFF", 5.0)
+JOB_LEASE_SECONDS = _env_float("JOB_LEASE_SECONDS", 300.0)
+JOB_RETENTION = _env_int("JOB_RETENTION", 24 * 3600)
+
+# Überwachte Suchen (Watches)
+WATCH_DB_PATH = os.environ.get("WATCH_DB_PATH", os.path.join(DATA_DIR, "watches.sqlite3"))
+WATCH_DEFAULT_INTERVAL = _env_int("WATCH_DEFAULT_INTERVAL", 300)
+WATCH_MIN_INTERVAL = _env_int("WATCH_MIN_INTERVAL", 60)
+WATCH_MAX_PAGES = _env_int("WATCH_MAX_PAGES", 10)
+WATCH_CONCURRENCY = _env_int("WATCH_CONCURRENCY", 2)
+WATCH_EVENT_RETENTION = _env_int("WATCH_EVENT_RETENTION", 7 * 24 * 3600)
+WATCH_WEBHOOK_TIMEOUT = _env_float("WATCH_WEBHOOK_TIMEOUT", 10.0)
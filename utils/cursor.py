@@ -0,0 +1,36 @@
+import base64
+import hashlib
+import json
+from typing import List, Set, Tuple
+
+# Pro Anzeige der Vorseite nur ein 4-Byte-Fingerabdruck, damit der Cursor kurz bleibt
+FINGERPRINT_SIZE = 4
+
+
+def fingerprint(adid: str) -> bytes:
+    return hashlib.blake2b(adid.encode(), digest_size=FINGERPRINT_SIZE).digest()
+
+
+def encode_cursor(params: dict, page: int, previous_ids: List[str]) -> str:
+    seen = b"".join(fingerprint(adid) for adid in previous_ids)
+    payload = {
+        "q": {name: value for name, value in params.items() if value is not None},
+        "p": page,
+        "s": base64.urlsafe_b64encode(seen).decode(),
+    }
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[dict, int, Set[bytes]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        params, page = dict(payload["q"]), int(payload["p"])
+        seen_bytes = base64.urlsafe_b64decode(payload["s"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if page < 1:
+        raise ValueError("Invalid cursor: page must be positive")
+    seen = {seen_bytes[i:i + FINGERPRINT_SIZE] for i in range(0, len(seen_bytes), FINGERPRINT_SIZE)}
+    return params, page, seen
@@ -0,0 +1,32 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """Zeitbudget einer Anfrage, aus dem alle Navigations- und Selector-Timeouts abgeleitet werden."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self._expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def share(self, fraction: float) -> "Deadline":
+        # Teilbudget, z.B. damit nach einem hängenden ersten Versuch noch Zeit für den Fallback bleibt
+        return Deadline(self.remaining() * fraction)
+
+    def timeout_ms(self, cap_ms: Optional[float] = None) -> float:
+        # Playwright-Timeout in ms: höchstens cap_ms, nie mehr als das Restbudget
+        remaining_ms = self.remaining() * 1000
+        if remaining_ms <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded")
+        return min(cap_ms, remaining_ms) if cap_ms is not None else remaining_ms
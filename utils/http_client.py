@@ -0,0 +1,38 @@
+from typing import TYPE_CHECKING, Optional
+
+from utils import config
+from utils.browser import get_random_ua
+
+if TYPE_CHECKING:
+    import httpx
+
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    # Ein geteilter Client hält Keep-Alive- und HTTP/2-Verbindungen über Anfragen hinweg offen
+    global _client
+    if _client is None:
+        # httpx wird erst für die erste browserlose Anfrage geladen
+        import httpx
+
+        _client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=config.HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=config.HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=config.HTTP_MAX_CONNECTIONS),
+            headers={
+                "User-Agent": get_random_ua(),
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "de-DE,de;q=0.9",
+            },
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from utils import config
+from utils.responses import dumps
+
+
+class JobStore:
+    """SQLite-Queue für Hintergrund-Jobs; mehrere Worker-Prozesse teilen sich dieselbe Datei.
+
+    Ein Job besteht aus Tasks (eine Ergebnisseite bzw. eine Anzeige), die einzeln geleast,
+    wiederholt und abgeschlossen werden.
+    """
+
+    def __init__(self, path: str = config.JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # timeout: andere Prozesse halten die Schreibsperre nur für kurze Transaktionen
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                params TEXT NOT NULL,
+                concurrency INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                leased_by TEXT,
+                lease_until REAL,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (status, next_attempt_at);
+            CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id, seq);
+        """)
+        self._db.commit()
+
+    def _execute(self, fn, write: bool = False):
+        with self._lock:
+            try:
+                if write:
+                    # Schreibsperre sofort nehmen: Lesen und Leasen dürfen nicht zwischen Prozessen verzahnt sein
+                    self._db.execute("BEGIN IMMEDIATE")
+                result = fn(self._db)
+                self._db.commit()
+                return result
+            except Exception:
+                self._db.rollback()
+                raise
+
+    async def _run(self, fn, write: bool = False):
+        return await asyncio.to_thread(self._execute, fn, write)
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    async def create_job(self, job_type: str, params: dict, payloads: List[dict], concurrency: int) -> dict:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        def insert(db):
+            db.execute("INSERT INTO jobs (id, type, params, concurrency, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                       (job_id, job_type, json.dumps(params), concurrency, "queued", now))
+            db.executemany("INSERT INTO tasks (job_id, seq, payload, status, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                           [(job_id, seq, json.dumps(payload), "queued", now) for seq, payload in enumerate(payloads)])
+
+        await self._run(insert, write=True)
+        return await self.get_job(job_id)
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        row = await self._run(lambda db: db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        return self._job_dict(row) if row else None
+
+    async def list_jobs(self, limit: int = 100) -> List[dict]:
+        rows = await self._run(lambda db: db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?",
+                                                     (limit,)).fetchall())
+        return [self._job_dict(row) for row in rows]
+
+    async def progress(self, job_id: str) -> dict:
+        rows = await self._run(lambda db: db.execute("SELECT status, COUNT(*) AS n FROM tasks WHERE job_id = ? "
+                                                     "GROUP BY status", (job_id,)).fetchall())
+        counts = {row["status"]: row["n"] for row in rows}
+        return {
+            "total": sum(counts.values()),
+            **{status: counts.get(status, 0) for status in ("queued", "running", "done", "failed", "skipped")},
+        }
+
+    async def tasks(self, job_id: str) -> List[dict]:
+        rows = await self._run(lambda db: db.execute("SELECT * FROM tasks WHERE job_id = ? ORDER BY seq",
+                                                     (job_id,)).fetchall())
+        return [
+            {
+                "seq": row["seq"],
+                "payload": json.loads(row["payload"]),
+                "status": row["status"],
+                "attempts": row["attempts"],
+                "result": json.loads(row["result"]) if row["result"] is not None else None,
+                "error": row["error"],
+            }
+            for row in rows
+        ]
+
+    async def claim_task(self, worker_id: str, lease_seconds: float = config.JOB_LEASE_SECONDS) -> Optional[dict]:
+        # Ältester Job zuerst, aber nie mehr laufende Tasks pro Job als dessen concurrency erlaubt
+        now = time.time()
+
+        def claim(db):
+            rows = db.execute("""
+                UPDATE tasks SET status = 'running', leased_by = ?, lease_until = ?, attempts = attempts + 1
+                WHERE id = (
+                    SELECT t.id FROM tasks t JOIN jobs j ON j.id = t.job_id
+                    WHERE t.status = 'queued' AND t.next_attempt_at <= ? AND j.status IN ('queued', 'running')
+                      AND (SELECT COUNT(*) FROM tasks r WHERE r.job_id = t.job_id AND r.status = 'running')
+                          < j.concurrency
+                    ORDER BY j.created_at, t.seq
+                    LIMIT 1
+                )
+                RETURNING id, job_id, seq, payload, attempts
+            """, (worker_id, now + lease_seconds, now)).fetchall()
+            if not rows:
+                return None
+            row = rows[0]
+            job = db.execute("SELECT type, params FROM jobs WHERE id = ?", (row["job_id"],)).fetchone()
+            db.execute("UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'queued'", (row["job_id"],))
+            return {
+                "id": row["id"],
+                "job_id": row["job_id"],
+                "seq": row["seq"],
+                "payload": json.loads(row["payload"]),
+                "attempts": row["attempts"],
+                "type": job["type"],
+                "params": json.loads(job["params"]),
+            }
+
+        return await self._run(claim, write=True)
+
+    def _finish_job_if_done(self, db, job_id: str):
+        remaining = db.execute("SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status IN ('queued', 'running')",
+                               (job_id,)).fetchone()[0]
+        if remaining == 0:
+            failed = db.execute("SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status = 'failed'",
+                                (job_id,)).fetchone()[0]
+            done = db.execute("SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status = 'done'",
+                              (job_id,)).fetchone()[0]
+            db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                       ("failed" if failed and not done else "done", time.time(), job_id))
+
+    async def complete_task(self, task: dict, result, stop_after: bool = False):
+        # stop_after: leere Suchseite, höhere Seiten desselben Jobs werden übersprungen
+        def complete(db):
+            db.execute("UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_until = NULL WHERE id = ?",
+                       (dumps(result), task["id"]))
+            if stop_after:
+                db.execute("UPDATE tasks SET status = 'skipped' WHERE job_id = ? AND seq > ? AND status = 'queued'",
+                           (task["job_id"], task["seq"]))
+            self._finish_job_if_done(db, task["job_id"])
+
+        await self._run(complete, write=True)
+
+    async def fail_task(self, task: dict, error: str, retry: bool,
+                        max_attempts: int = config.JOB_MAX_ATTEMPTS, backoff: float = config.JOB_RETRY_BACKOFF):
+        def fail(db):
+            if retry and task["attempts"] < max_attempts:
+                # Exponentielles Backoff mit Jitter
+                delay = backoff * 2 ** (task["attempts"] - 1) * random.uniform(0.8, 1.2)
+                db.execute("UPDATE tasks SET status = 'queued', error = ?, next_attempt_at = ?, lease_until = NULL "
+                           "WHERE id = ?", (error, time.time() + delay, task["id"]))
+            else:
+                db.execute("UPDATE tasks SET status = 'failed', error = ?, lease_until = NULL WHERE id = ?",
+                           (error, task["id"]))
+            self._finish_job_if_done(db, task["job_id"])
+
+        await self._run(fail, write=True)
+
+    async def requeue_expired(self, max_attempts: int = config.JOB_MAX_ATTEMPTS) -> int:
+        # Tasks abgestürzter Worker wieder freigeben; ein Task, der seinen Worker jedes Mal zum Absturz
+        # bringt, schlägt nach max_attempts Versuchen fehl statt endlos neu vergeben zu werden
+        def requeue(db):
+            expired = db.execute("SELECT id, job_id, attempts FROM tasks WHERE status = 'running' AND lease_until < ?",
+                                 (time.time(),)).fetchall()
+            for row in expired:
+                if row["attempts"] >= max_attempts:
+                    db.execute("UPDATE tasks SET status = 'failed', error = ?, leased_by = NULL, lease_until = NULL "
+                               "WHERE id = ?", (f"Lease expired after {row['attempts']} attempts", row["id"]))
+                    self._finish_job_if_done(db, row["job_id"])
+                else:
+                    db.execute("UPDATE tasks SET status = 'queued', leased_by = NULL, lease_until = NULL "
+                               "WHERE id = ?", (row["id"],))
+            return len(expired)
+
+        return await self._run(requeue, write=True)
+
+    async def cancel_job(self, job_id: str) -> bool:
+        def cancel(db):
+            updated = db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                                 "WHERE id = ? AND status IN ('queued', 'running')", (time.time(), job_id)).rowcount
+            db.execute("UPDATE tasks SET status = 'skipped' WHERE job_id = ? AND status = 'queued'", (job_id,))
+            return updated > 0
+
+        return await self._run(cancel, write=True)
+
+    async def prune_jobs(self, older_than: float):
+        def prune(db):
+            ids = [row[0] for row in db.execute("SELECT id FROM jobs WHERE finished_at < ?", (older_than,))]
+            db.executemany("DELETE FROM tasks WHERE job_id = ?", [(job_id,) for job_id in ids])
+            db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+
+        await self._run(prune, write=True)
+
+    async def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,137 @@
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from libs.websites.models import Listing, parse_number
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class AdColumns:
+    """Suchergebnisse spaltenweise: ein Eintrag je Anzeige, Preis NaN, wenn er keine Zahl ist."""
+    __slots__ = ("adid", "price", "negotiable", "zip")
+
+    def __init__(self, ads: Iterable):
+        adids, prices, negotiable, locations = [], [], [], []
+        for ad in ads:
+            if isinstance(ad, Listing):
+                adids.append(ad.adid)
+                prices.append(ad.price_value)
+                negotiable.append(ad.negotiable)
+                locations.append(ad.location)
+            else:
+                # Einträge aus dem SQLite-Cache sind dicts; ältere Einträge haben noch kein negotiable/location
+                adids.append(ad["adid"])
+                prices.append(parse_number((ad.get("price") or "").replace(",", ".")))
+                negotiable.append(bool(ad.get("negotiable")))
+                locations.append(ad.get("location") or "")
+        self.adid = np.array(adids, dtype=object)
+        self.price = np.array(prices, dtype=np.float64)
+        self.negotiable = np.array(negotiable, dtype=np.bool_)
+        # "10178 Mitte" -> "10178"; Orte ohne führende Postleitzahl bleiben leer
+        self.zip = np.array(locations, dtype="U5")
+        self.zip[~np.char.isdigit(self.zip)] = ""
+
+    def __len__(self) -> int:
+        return len(self.adid)
+
+
+def _round(value) -> Optional[float]:
+    return round(float(value), 2) if np.isfinite(value) else None
+
+
+def _price_summary(prices: np.ndarray) -> dict:
+    if not len(prices):
+        return {"count": 0, "min": None, "max": None, "mean": None, "median": None}
+    return {
+        "count": int(len(prices)),
+        "min": _round(prices.min()),
+        "max": _round(prices.max()),
+        "mean": _round(prices.mean()),
+        "median": _round(np.median(prices)),
+    }
+
+
+def _group_medians(groups: np.ndarray, prices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # Nach Gruppe und Preis sortieren; der Median jeder Gruppe liegt dann in der Mitte ihres Abschnitts
+    order = np.lexsort((prices, groups))
+    sorted_prices = prices[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return (sorted_prices[starts + (counts - 1) // 2] + sorted_prices[starts + counts // 2]) / 2
+
+
+def _by_zip(columns: AdColumns, priced: np.ndarray, zip_digits: int) -> List[dict]:
+    known = columns.zip != ""
+    if not known.any():
+        return []
+    prefixes = columns.zip[known].astype(f"U{zip_digits}")
+    keys, groups, counts = np.unique(prefixes, return_inverse=True, return_counts=True)
+    negotiable = np.bincount(groups, weights=columns.negotiable[known], minlength=len(keys))
+
+    with_price = priced[known]
+    price_groups = groups[with_price]
+    prices = columns.price[known][with_price]
+    priced_counts = np.bincount(price_groups, minlength=len(keys))
+    sums = np.bincount(price_groups, weights=prices, minlength=len(keys))
+    medians = np.full(len(keys), np.nan)
+    has_prices = priced_counts > 0
+    if has_prices.any():
+        medians[has_prices] = _group_medians(price_groups, prices, priced_counts[has_prices])
+    means = np.divide(sums, priced_counts, out=np.full(len(keys), np.nan), where=has_prices)
+
+    return [{
+        "zip": str(keys[i]),
+        "count": int(counts[i]),
+        "priced": int(priced_counts[i]),
+        "median": _round(medians[i]),
+        "mean": _round(means[i]),
+        "negotiable_share": _round(negotiable[i] / counts[i]),
+    } for i in np.argsort(-counts, kind="stable")]
+
+
+def market_stats(ads: Iterable, bins: int = 20, zip_digits: int = 2, outlier_factor: float = 1.5) -> dict:
+    columns = ads if isinstance(ads, AdColumns) else AdColumns(ads)
+    priced = ~np.isnan(columns.price)
+    prices = columns.price[priced]
+    result = {
+        "count": len(columns),
+        "priced": int(priced.sum()),
+        "negotiable": int(columns.negotiable.sum()),
+        "price": _price_summary(prices),
+        "price_by_negotiable": {
+            "negotiable": _price_summary(columns.price[priced & columns.negotiable]),
+            "fixed": _price_summary(columns.price[priced & ~columns.negotiable]),
+        },
+        "quantiles": {},
+        "histogram": None,
+        "outliers": None,
+        "by_zip": _by_zip(columns, priced, zip_digits),
+    }
+    if not len(prices):
+        return result
+
+    values = np.quantile(prices, QUANTILES)
+    result["quantiles"] = {f"p{round(q * 100)}": _round(value) for q, value in zip(QUANTILES, values)}
+
+    # Ausreißer nach Tukey: außerhalb von Q1 - k*IQR und Q3 + k*IQR
+    q1, q3 = values[QUANTILES.index(0.25)], values[QUANTILES.index(0.75)]
+    low_fence = max(q1 - outlier_factor * (q3 - q1), prices.min())
+    high_fence = min(q3 + outlier_factor * (q3 - q1), prices.max())
+    low = priced & (columns.price < low_fence)
+    high = priced & (columns.price > high_fence)
+    result["outliers"] = {
+        "low_fence": _round(low_fence),
+        "high_fence": _round(high_fence),
+        "low": columns.adid[low].tolist(),
+        "high": columns.adid[high].tolist(),
+    }
+
+    # Histogramm nur über den Bereich innerhalb der Zäune, damit einzelne Ausreißer es nicht plattdrücken
+    counts, edges = np.histogram(prices, bins=bins, range=(low_fence, high_fence))
+    result["histogram"] = {
+        "edges": [_round(edge) for edge in edges],
+        "counts": counts.tolist(),
+        "below": int(low.sum()),
+        "above": int(high.sum()),
+    }
+    return result
@@ -0,0 +1,110 @@
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from utils import config
+
+
+def process_table() -> Dict[int, tuple]:
+    # pid -> (ppid, name, rss_bytes); nur unter Linux verfügbar
+    table: Dict[int, tuple] = {}
+    if not os.path.isdir("/proc"):
+        return table
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        name = stat[stat.find("(") + 1:stat.rfind(")")]
+        fields = stat[stat.rfind(")") + 2:].split()
+        table[int(entry)] = (int(fields[1]), name, int(fields[21]) * page_size)
+    return table
+
+
+def chromium_pids(table: Dict[int, tuple]) -> Set[int]:
+    return {pid for pid, (_, name, _) in table.items() if "chrom" in name.lower() or "headless" in name.lower()}
+
+
+def process_tree_rss(root_pid: Optional[int], table: Optional[Dict[int, tuple]] = None) -> Optional[int]:
+    if root_pid is None:
+        return None
+    table = table if table is not None else process_table()
+    if root_pid not in table:
+        return None
+    children: Dict[int, List[int]] = {}
+    for pid, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += table[pid][2]
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class MemoryGovernor:
+    """Misst den Speicher der Chromium-Instanzen und entscheidet, welche recycelt wird.
+
+    Grenzen: BROWSER_MAX_RSS_MB pro Instanz und BROWSER_MAX_TOTAL_RSS_MB für alle zusammen. Ein Browser
+    wird erst recycelt, wenn seine laufenden Anfragen fertig sind; hängen sie länger als
+    BROWSER_DRAIN_TIMEOUT, wird er trotzdem neu gestartet.
+    """
+
+    def __init__(self,
+                 max_rss_mb: int = config.BROWSER_MAX_RSS_MB,
+                 max_total_rss_mb: int = config.BROWSER_MAX_TOTAL_RSS_MB,
+                 drain_timeout: float = config.BROWSER_DRAIN_TIMEOUT):
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.max_total_rss = max_total_rss_mb * 1024 * 1024 if max_total_rss_mb else None
+        self.drain_timeout = drain_timeout
+        self.total_rss: Optional[int] = None
+        self.process_rss: Optional[int] = None
+        self.peak_total_rss = 0
+        self.peak_process_rss = 0
+
+    def sample(self, slots):
+        table = process_table()
+        for slot in slots:
+            if not slot.recycling:
+                slot.rss = process_tree_rss(slot.root_pid, table)
+                slot.peak_rss = max(slot.peak_rss, slot.rss or 0)
+        measured = [slot.rss for slot in slots if slot.rss]
+        self.total_rss = sum(measured) if measured else None
+        # API-Prozess samt aller Kindprozesse, als Anhaltspunkt für die Container-Größe
+        self.process_rss = process_tree_rss(os.getpid(), table)
+        self.peak_total_rss = max(self.peak_total_rss, self.total_rss or 0)
+        self.peak_process_rss = max(self.peak_process_rss, self.process_rss or 0)
+
+    def over_limit(self, slot) -> bool:
+        return bool(self.max_rss and slot.rss and slot.rss > self.max_rss)
+
+    def over_total(self, slots):
+        # Immer nur einen Browser gleichzeitig wegen der Gesamtgrenze recyceln, den größten zuerst
+        if not self.max_total_rss or not self.total_rss or self.total_rss <= self.max_total_rss:
+            return None
+        if any(slot.retiring or slot.recycling for slot in slots):
+            return None
+        candidates = [slot for slot in slots if slot.rss]
+        return max(candidates, key=lambda slot: slot.rss) if candidates else None
+
+    def drain_expired(self, slot) -> bool:
+        return bool(slot.in_use and slot.retiring_since
+                    and time.monotonic() - slot.retiring_since > self.drain_timeout)
+
+    def stats(self) -> dict:
+        def mb(value: Optional[int]) -> Optional[float]:
+            return round(value / 1024 / 1024, 1) if value else None
+
+        return {
+            "max_rss_mb": mb(self.max_rss),
+            "max_total_rss_mb": mb(self.max_total_rss),
+            "drain_timeout": self.drain_timeout,
+            "chromium_rss_mb": mb(self.total_rss),
+            "peak_chromium_rss_mb": mb(self.peak_total_rss),
+            "process_tree_rss_mb": mb(self.process_rss),
+            "peak_process_tree_rss_mb": mb(self.peak_process_rss),
+        }
@@ -0,0 +1,134 @@
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from utils.rate_limit import host_scheduler
+from utils.singleflight import inflight
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "kleinanzeigen_stage_seconds",
+    "Duration of individual scraping stages",
+    ["stage", "page"],
+    buckets=STAGE_BUCKETS,
+)
+EXTRACTION_SECONDS = Histogram(
+    "kleinanzeigen_extraction_seconds",
+    "Duration of data extraction per helper",
+    ["helper"],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "kleinanzeigen_request_seconds",
+    "Total HTTP request latency until the response headers are sent",
+    ["endpoint", "method", "status"],
+    buckets=STAGE_BUCKETS,
+)
+FALLBACKS = Counter(
+    "kleinanzeigen_fallbacks_total",
+    "Usage of fallback URLs and engines",
+    ["kind"],
+)
+SELECTOR_TIMEOUTS = Counter(
+    "kleinanzeigen_selector_timeouts_total",
+    "wait_for_selector calls that ran into their timeout",
+    ["selector"],
+)
+SCRAPE_FAILURES = Counter(
+    "kleinanzeigen_scrape_failures_total",
+    "Failed page scrapes by classification",
+    ["page", "kind"],
+)
+SESSION_REFRESHES = Counter(
+    "kleinanzeigen_session_refreshes_total",
+    "Captures of the shared storage_state by trigger and result",
+    ["reason", "result"],
+)
+PARSE_ERRORS = Counter(
+    "kleinanzeigen_parse_errors_total",
+    "Fields that could not be extracted",
+    ["field"],
+)
+
+
+class AppStatsCollector:
+    # Liest Pool-, Cache- und Blocking-Zustand erst beim Scrape, statt Gauges ständig nachzuführen
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        state = self.app.state
+        pool = getattr(state, "browser_pool", None)
+        if pool is not None:
+            stats = pool.stats()
+            occupancy = GaugeMetricFamily("kleinanzeigen_pool_pages", "Pooled browser pages by state", labels=["state"])
+            capacity = stats["size"] * stats["pages_per_browser"]
+            occupancy.add_metric(["in_use"], stats["in_use"])
+            occupancy.add_metric(["idle"], max(capacity - stats["in_use"], 0))
+            yield occupancy
+            yield GaugeMetricFamily("kleinanzeigen_pool_waiting", "Requests waiting for a browser page",
+                                    value=stats["waiting"])
+            rss = GaugeMetricFamily("kleinanzeigen_chromium_rss_bytes", "Resident memory of each Chromium instance",
+                                    labels=["browser"])
+            for browser in stats["browsers"]:
+                if browser["rss_mb"] is not None:
+                    rss.add_metric([str(browser["index"])], browser["rss_mb"] * 1024 * 1024)
+            yield rss
+            contexts = GaugeMetricFamily("kleinanzeigen_browser_contexts", "Open browser contexts per Chromium instance",
+                                         labels=["browser"])
+            for browser in stats["browsers"]:
+                contexts.add_metric([str(browser["index"])], browser["contexts"])
+            yield contexts
+            if stats["memory"]["process_tree_rss_mb"] is not None:
+                yield GaugeMetricFamily("kleinanzeigen_process_tree_rss_bytes",
+                                        "Resident memory of the API process including Chromium",
+                                        value=stats["memory"]["process_tree_rss_mb"] * 1024 * 1024)
+            yield CounterMetricFamily("kleinanzeigen_pool_acquire_timeouts", "Page checkouts that timed out",
+                                      value=stats["acquire_timeouts"])
+            recycles = CounterMetricFamily("kleinanzeigen_pool_recycles", "Browser recycles by reason",
+                                           labels=["reason"])
+            for reason, count in stats["recycle_reasons"].items():
+                recycles.add_metric([reason], count)
+            yield recycles
+            yield CounterMetricFamily("kleinanzeigen_pool_context_replacements",
+                                      "Browser contexts replaced after BROWSER_CONTEXT_MAX_USES or a crash",
+                                      value=stats["context_replacements"])
+
+            if pool.resource_blocker is not None:
+                blocked = CounterMetricFamily("kleinanzeigen_blocked_requests", "Requests aborted by resource blocking",
+                                              labels=["resource_type"])
+                for resource_type, count in pool.resource_blocker.blocked.items():
+                    blocked.add_metric([resource_type], count)
+                yield blocked
+                yield CounterMetricFamily("kleinanzeigen_blocked_bytes_estimated",
+                                          "Estimated bytes saved by resource blocking",
+                                          value=pool.resource_blocker.estimated_bytes_saved)
+
+        cache = getattr(state, "response_cache", None)
+        if cache is not None:
+            lookups = CounterMetricFamily("kleinanzeigen_cache_lookups", "Response cache lookups", labels=["result"])
+            lookups.add_metric(["hit"], cache.hits)
+            lookups.add_metric(["miss"], cache.misses)
+            yield lookups
+
+        navigation = host_scheduler.stats()
+        limit = GaugeMetricFamily("kleinanzeigen_nav_concurrency_limit",
+                                  "Current adaptive limit of concurrent navigations per host", labels=["host"])
+        in_flight = GaugeMetricFamily("kleinanzeigen_nav_in_flight", "Navigations in progress per host",
+                                      labels=["host"])
+        decreases = CounterMetricFamily("kleinanzeigen_nav_limit_decreases", "Backoffs of the adaptive limit",
+                                        labels=["host", "reason"])
+        for host, stats in navigation.items():
+            limit.add_metric([host], stats["limit"])
+            in_flight.add_metric([host], stats["in_flight"])
+            for reason, count in stats["decreases"].items():
+                decreases.add_metric([host, reason], count)
+        yield limit
+        yield in_flight
+        yield decreases
+
+        singleflight = inflight.stats()
+        calls = CounterMetricFamily("kleinanzeigen_singleflight_calls", "Scrape calls by outcome", labels=["outcome"])
+        calls.add_metric(["executed"], singleflight["executions"])
+        calls.add_metric(["coalesced"], singleflight["coalesced"])
+        yield calls
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+from utils import config
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1):
+        if self.rate <= 0:
+            return
+        # Der Lock bleibt während des Wartens gehalten, damit Wartende in FIFO-Reihenfolge bedient werden
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float = config.HOST_RATE_LIMIT, burst: int = config.HOST_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).hostname or ""
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def acquire(self, url: str):
+        await self.bucket(url).acquire()
+
+
+host_rate_limiter = HostRateLimiter()
+
+
+class AdaptiveLimit:
+    """AIMD-Grenze für gleichzeitige Navigationen zu einem Host.
+
+    Jede erfolgreiche, schnelle Navigation hebt die Grenze um 1/limit an (also etwa +1 pro voller
+    Runde), solange die Erfolgsquote stimmt. 429/403, Bot-Challenges, Timeouts und sehr langsame
+    Antworten halbieren sie, höchstens einmal pro Cooldown, damit eine Welle gleichzeitiger Fehler
+    die Grenze nicht sofort auf das Minimum drückt.
+    """
+
+    def __init__(self,
+                 initial: int = config.NAV_CONCURRENCY_INITIAL,
+                 floor: int = config.NAV_CONCURRENCY_MIN,
+                 ceiling: int = config.NAV_CONCURRENCY_MAX,
+                 latency_target: float = config.NAV_LATENCY_TARGET,
+                 success_target: float = config.NAV_SUCCESS_TARGET,
+                 backoff: float = config.NAV_BACKOFF,
+                 cooldown: float = config.NAV_BACKOFF_COOLDOWN):
+        self.floor = max(floor, 1)
+        self.ceiling = max(ceiling, self.floor)
+        self.limit = float(min(max(initial, self.floor), self.ceiling))
+        self.latency_target = latency_target
+        self.success_target = success_target
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.success_rate = 1.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.increases = 0
+        self.decreases = Counter()
+
+    @property
+    def current(self) -> int:
+        return max(self.floor, int(self.limit))
+
+    async def acquire(self):
+        if self.in_flight < self.current and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Platz war schon zugeteilt: zurückgeben, ohne die Grenze anzupassen
+                self.in_flight -= 1
+                self._wake()
+            elif future in self._waiters:
+                # _wake überspringt abgebrochene Futures und hat diesen evtl. schon entnommen
+                self._waiters.remove(future)
+            raise
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.current:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def release(self, outcome: str, latency: float):
+        self.in_flight -= 1
+        self.record(outcome, latency)
+
+    def record(self, outcome: str, latency: Optional[float] = None):
+        # "error" (z.B. 404) und "cancelled" sagen nichts über die Last auf dem Host aus
+        if outcome in ("ok", "throttled", "challenge", "timeout"):
+            self.success_rate = 0.9 * self.success_rate + 0.1 * (outcome == "ok")
+        if outcome == "ok" and latency is not None and latency > 2 * self.latency_target:
+            outcome = "slow"
+        if outcome == "ok":
+            if (latency is None or latency <= self.latency_target) and self.success_rate >= self.success_target \
+                    and self.limit < self.ceiling:
+                self.limit = min(self.ceiling, self.limit + 1 / self.limit)
+                self.increases += 1
+        elif outcome in ("throttled", "challenge", "timeout", "slow"):
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self.limit = max(self.floor, self.limit * self.backoff)
+                self.decreases[outcome] += 1
+        self._wake()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.current,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "success_rate": round(self.success_rate, 3),
+            "increases": self.increases,
+            "decreases": dict(self.decreases),
+        }
+
+
+class Navigation:
+    THROTTLE_STATUS = {403, 429, 503}
+
+    def __init__(self):
+        self.outcome = "ok"
+
+    def status(self, status_code: Optional[int]):
+        if status_code in self.THROTTLE_STATUS:
+            self.outcome = "throttled"
+        elif status_code is not None and status_code >= 400:
+            self.outcome = "error"
+
+
+def _outcome_of(e: BaseException) -> str:
+    if isinstance(e, asyncio.CancelledError):
+        return "cancelled"
+    # Playwrights TimeoutError erbt nicht von der eingebauten, heißt aber genauso
+    if isinstance(e, TimeoutError) or type(e).__name__ in ("TimeoutError", "DeadlineExceeded"):
+        return "timeout"
+    return "error"
+
+
+class HostScheduler:
+    """Gemeinsamer Weg für alle Navigationen: adaptive Parallelität und Token-Bucket pro Host."""
+
+    def __init__(self, rate_limiter: HostRateLimiter = host_rate_limiter):
+        self.rate_limiter = rate_limiter
+        self._limits: Dict[str, AdaptiveLimit] = {}
+
+    def limit(self, url: str) -> AdaptiveLimit:
+        host = urlsplit(url).hostname or ""
+        if host not in self._limits:
+            self._limits[host] = AdaptiveLimit()
+        return self._limits[host]
+
+    @asynccontextmanager
+    async def navigation(self, url: str, timeout: Optional[float] = None):
+        limit = self.limit(url)
+        if timeout is None:
+            await limit.acquire()
+        else:
+            await asyncio.wait_for(limit.acquire(), timeout)
+        navigation = Navigation()
+        started = None
+        try:
+            await self.rate_limiter.acquire(url)
+            started = time.monotonic()
+            yield navigation
+        except BaseException as e:
+            # Ein schon erkannter Status (z.B. 429) geht vor der daraus folgenden Exception
+            limit.release(navigation.outcome if navigation.outcome != "ok" else _outcome_of(e), None)
+            raise
+        else:
+            limit.release(navigation.outcome, time.monotonic() - started)
+
+    def report(self, url: str, outcome: str):
+        # Erst nach der Navigation erkannte Probleme, z.B. eine Bot-Challenge im Seiteninhalt
+        self.limit(url).record(outcome)
+
+    def stats(self) -> dict:
+        return {host: limit.stats() for host, limit in self._limits.items()}
+
+
+host_scheduler = HostScheduler()
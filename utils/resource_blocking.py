@@ -0,0 +1,110 @@
+import weakref
+from collections import Counter
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from utils import config
+
+# Grobe Durchschnittsgrößen, da abgebrochene Anfragen keine echte Größe liefern
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "imageset": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "script": 80_000,
+    "stylesheet": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+
+def _matches_domain(host: str, domains: Iterable[str]) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class BlockingProfile:
+    def __init__(self,
+                 block_types: Iterable[str] = (),
+                 deny_domains: Iterable[str] = (),
+                 allow_domains: Iterable[str] = (),
+                 block_third_party_scripts: bool = False):
+        self.block_types = set(block_types)
+        self.deny_domains = list(deny_domains)
+        self.allow_domains = list(allow_domains)
+        self.block_third_party_scripts = block_third_party_scripts
+
+    def block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        if resource_type == "document":
+            return None
+        host = urlsplit(url).hostname or ""
+        if _matches_domain(host, self.deny_domains):
+            return "domain"
+        if resource_type in self.block_types:
+            return "type"
+        if self.block_third_party_scripts and resource_type in ("script", "xhr", "fetch") \
+                and not _matches_domain(host, self.allow_domains):
+            return "third_party"
+        return None
+
+
+def default_profiles() -> Dict[str, BlockingProfile]:
+    common = {
+        "deny_domains": config.BLOCK_DOMAINS,
+        # Der Host der konfigurierten Basis-URL ist nie Third-Party
+        "allow_domains": [*config.ALLOW_DOMAINS, urlsplit(config.BASE_URL).hostname or ""],
+        "block_third_party_scripts": config.BLOCK_THIRD_PARTY_SCRIPTS,
+    }
+    return {
+        "search": BlockingProfile(block_types=config.BLOCK_RESOURCE_TYPES_SEARCH, **common),
+        "detail": BlockingProfile(block_types=config.BLOCK_RESOURCE_TYPES_DETAIL, **common),
+    }
+
+
+class ResourceBlocker:
+    def __init__(self, profiles: Optional[Dict[str, BlockingProfile]] = None, default_profile: str = "detail"):
+        self.profiles = profiles if profiles is not None else default_profiles()
+        self.default_profile = default_profile
+        self._context_profiles = weakref.WeakKeyDictionary()
+        self.allowed = 0
+        self.blocked = Counter()
+        self.blocked_by_reason = Counter()
+        self.estimated_bytes_saved = 0
+
+    async def attach(self, context, profile: Optional[str] = None):
+        self._context_profiles[context] = profile or self.default_profile
+
+        async def handle(route):
+            await self._handle(context, route)
+
+        await context.route("**/*", handle)
+
+    def set_profile(self, context, profile: Optional[str]):
+        if profile and context in self._context_profiles:
+            self._context_profiles[context] = profile
+
+    async def _handle(self, context, route):
+        request = route.request
+        profile = self.profiles.get(self._context_profiles.get(context, self.default_profile))
+        reason = profile.block_reason(request.resource_type, request.url) if profile else None
+        try:
+            if reason:
+                self.blocked[request.resource_type] += 1
+                self.blocked_by_reason[reason] += 1
+                self.estimated_bytes_saved += ESTIMATED_BYTES.get(request.resource_type, DEFAULT_ESTIMATED_BYTES)
+                await route.abort("blockedbyclient")
+            else:
+                self.allowed += 1
+                await route.continue_()
+        except Exception:
+            # Seite oder Kontext wurde währenddessen geschlossen
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "blocked_by_reason": dict(self.blocked_by_reason),
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+        }
@@ -0,0 +1,32 @@
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from starlette.responses import JSONResponse
+
+
+def _default(obj: Any):
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> str:
+    # Für NDJSON/SSE und die SQLite-Ablagen; Records werden ohne Umweg über dicts serialisiert
+    return orjson.dumps(obj, default=_default).decode()
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> ORJSONResponse:
+    # Ein zurückgegebenes Response-Objekt umgeht FastAPIs jsonable_encoder; die Header, die
+    # z.B. cached_response am injizierten Response gesetzt hat, werden übernommen
+    result = ORJSONResponse(content, status_code=status_code)
+    if response is not None:
+        for name, value in response.headers.items():
+            if name not in ("content-length", "content-type"):
+                result.headers.append(name, value)
+    return result
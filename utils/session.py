@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Optional
+from urllib.parse import urlsplit
+
+from libs.websites import kleinanzeigen as lib
+from utils import config
+from utils.metrics import SESSION_REFRESHES
+from utils.rate_limit import host_scheduler
+
+
+async def warm_up(browser_manager) -> dict:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    # Startseite einmal ohne Resource-Blocking laden, damit Consent-Banner und Cookies greifen
+    context = await browser_manager.new_context()
+    try:
+        page = await context.new_page()
+        async with host_scheduler.navigation(config.BASE_URL) as navigation:
+            response = await page.goto(f"{config.BASE_URL}/", timeout=30000)
+            navigation.status(response.status if response is not None else None)
+            await page.wait_for_load_state("domcontentloaded", timeout=15000)
+        try:
+            await page.click(lib.CONSENT_ACCEPT_SELECTOR, timeout=5000)
+            await page.wait_for_load_state("networkidle", timeout=5000)
+        except PlaywrightTimeoutError:
+            # Kein Banner, z.B. weil der Consent schon gesetzt ist
+            pass
+        if lib.is_bot_challenge(await page.content()):
+            raise RuntimeError("Bot challenge during session warmup")
+        return await context.storage_state()
+    finally:
+        await context.close()
+
+
+class SessionState:
+    """Ein vorgewärmter storage_state (Consent akzeptiert, Cookies gesetzt) für alle Browser-Kontexte.
+
+    Wird einmal erfasst, in SESSION_STATE_PATH abgelegt (so teilen sich auch Job-Worker-Prozesse und
+    Neustarts denselben Zustand) und neu erfasst, sobald er abläuft oder eine Bot-Challenge auftritt.
+    """
+
+    def __init__(self,
+                 path: Optional[str] = config.SESSION_STATE_PATH,
+                 ttl: float = config.SESSION_TTL,
+                 min_refresh_interval: float = config.SESSION_MIN_REFRESH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.state: Optional[dict] = None
+        self.captured_at = 0.0
+        self.generation = 0
+        self.stale_reason: Optional[str] = None
+        self._invalidated_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = asyncio.Lock()
+        self.refreshes = Counter()
+        self.failures = 0
+
+    def load(self) -> bool:
+        # Von einem anderen Prozess erfassten Zustand übernehmen, falls er neuer und noch gültig ist
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read session state: {str(e)}")
+            return False
+        captured_at = saved.get("captured_at", 0.0)
+        if captured_at <= max(self.captured_at, self._invalidated_at) or self._expired(saved["state"], captured_at):
+            return False
+        self._adopt(saved["state"], captured_at)
+        return True
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"captured_at": self.captured_at, "state": self.state}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[WARNING] Could not save session state: {str(e)}")
+
+    def _adopt(self, state: dict, captured_at: float):
+        self.state = state
+        self.captured_at = captured_at
+        self.generation += 1
+        self.stale_reason = None
+
+    def _expired(self, state: dict, captured_at: float) -> bool:
+        now = time.time()
+        if now - captured_at > self.ttl:
+            return True
+        # Ein abgelaufenes Cookie der Website selbst macht den Zustand unbrauchbar
+        host = urlsplit(config.BASE_URL).hostname or ""
+        return any(0 < cookie.get("expires", -1) < now for cookie in state.get("cookies", [])
+                   if host.endswith(cookie.get("domain", "").lstrip(".")))
+
+    def needs_refresh(self) -> bool:
+        return self.state is None or self.stale_reason is not None or self._expired(self.state, self.captured_at)
+
+    def invalidate(self, reason: str):
+        if self.state is not None and self.stale_reason is None:
+            print(f"[WARNING] Session state invalidated ({reason}), capturing a new one")
+            self.stale_reason = reason
+            self._invalidated_at = time.time()
+
+    async def refresh(self, browser_manager) -> Optional[dict]:
+        async with self._lock:
+            if not self.needs_refresh() or self.load():
+                return self.state
+            # Bei anhaltenden Challenges nicht bei jeder Anfrage neu aufwärmen
+            if time.monotonic() - self._last_attempt < self.min_refresh_interval:
+                return self.state
+            self._last_attempt = time.monotonic()
+            reason = "initial" if self.state is None else self.stale_reason or "expired"
+            try:
+                state = await warm_up(browser_manager)
+            except Exception as e:
+                self.failures += 1
+                SESSION_REFRESHES.labels(reason, "failed").inc()
+                print(f"[WARNING] Session warmup failed: {str(e)}")
+                return self.state
+            self._adopt(state, time.time())
+            self.refreshes[reason] += 1
+            SESSION_REFRESHES.labels(reason, "ok").inc()
+            self._save()
+            return self.state
+
+    async def apply(self, context):
+        # Für bereits offene Kontexte; localStorage bleibt auf dem Stand ihrer Erstellung
+        await context.clear_cookies()
+        if self.state and self.state.get("cookies"):
+            await context.add_cookies(self.state["cookies"])
+
+    def stats(self) -> dict:
+        return {
+            "warm": self.state is not None,
+            "generation": self.generation,
+            "age": round(time.time() - self.captured_at) if self.state is not None else None,
+            "cookies": len(self.state.get("cookies", [])) if self.state else 0,
+            "stale_reason": self.stale_reason,
+            "refreshes": dict(self.refreshes),
+            "failures": self.failures,
+        }
+
+
+session_state = SessionState()
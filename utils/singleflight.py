@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Führt gleichzeitige Aufrufe mit demselben Schlüssel nur einmal aus.
+
+    Der erste Aufrufer startet die Arbeit als eigenen Task, alle weiteren warten auf dasselbe Ergebnis
+    (oder dieselbe Exception). Bricht ein Wartender ab, läuft die Arbeit für die übrigen weiter; erst wenn
+    niemand mehr wartet, wird sie abgebrochen.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        call = self._calls.get(key)
+        if call is None:
+            self.executions += 1
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Niemand wartet mehr: Arbeit abbrechen und neue Aufrufer nicht an den sterbenden Task hängen
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        coalesced = self.calls - self.executions
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / self.calls, 3) if self.calls else 0.0,
+            "in_flight": len(self._calls),
+        }
+
+
+inflight = SingleFlight()
@@ -0,0 +1,159 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils import config
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS snapshots (
+        digest TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        url TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        captured_at REAL NOT NULL,
+        PRIMARY KEY (digest, url)
+    );
+    CREATE INDEX IF NOT EXISTS snapshots_kind_captured ON snapshots (kind, captured_at);
+"""
+
+# Gleicher Inhalt unter gleicher URL wird nur einmal geführt, aber mit dem letzten Zeitpunkt
+UPSERT = """
+    INSERT INTO snapshots (digest, kind, url, size, captured_at) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (digest, url) DO UPDATE SET captured_at = excluded.captured_at
+"""
+
+
+def object_path(directory: str, digest: str) -> str:
+    return os.path.join(directory, "objects", digest[:2], f"{digest}.html.gz")
+
+
+def read_snapshot(directory: str, digest: str) -> str:
+    with open(object_path(directory, digest), "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
+
+
+class SnapshotStore:
+    """Gzip-komprimierte HTML-Snapshots, abgelegt unter dem SHA-256 ihres Inhalts.
+
+    Identische Seiten liegen nur einmal auf der Platte; ein SQLite-Index hält fest, unter welcher
+    URL und wann ein Inhalt gesehen wurde, damit scrapers/reparse.py ihn offline neu parsen kann.
+    """
+
+    def __init__(self, directory: str = config.SNAPSHOT_DIR, compression_level: int = config.SNAPSHOT_COMPRESSION):
+        self.directory = directory
+        self.compression_level = compression_level
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self.captured = 0
+        self.deduplicated = 0
+        self.failures = 0
+
+    def put(self, kind: str, url: str, html: str) -> str:
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = object_path(self.directory, digest)
+        if os.path.exists(path):
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Erst vollständig schreiben, dann umbenennen: Leser sehen nie halbe Dateien
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=self.compression_level, mtime=0))
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._db.execute(UPSERT, (digest, kind, url, len(data), time.time()))
+            self._db.commit()
+        self.captured += 1
+        return digest
+
+    def read(self, digest: str) -> str:
+        return read_snapshot(self.directory, digest)
+
+    def iter_entries(self, kind: Optional[str] = None, since: Optional[float] = None,
+                     limit: Optional[int] = None, batch_size: int = 1000) -> Iterator[List[Tuple[str, str, str]]]:
+        # Liefert (digest, kind, url) in Blöcken, damit auch Millionen Einträge nicht auf einmal im Speicher liegen
+        clauses, params = ["rowid > ?"], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if since is not None:
+            clauses.append("captured_at >= ?")
+            params.append(since)
+        query = f"SELECT rowid, digest, kind, url FROM snapshots WHERE {' AND '.join(clauses)} ORDER BY rowid LIMIT ?"
+        last_rowid, remaining = 0, limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            with self._lock:
+                rows = self._db.execute(query, [last_rowid, *params, size]).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            yield [(digest, kind, url) for _, digest, kind, url in rows]
+
+    def inventory(self) -> Dict[str, dict]:
+        # Vollständige Aufstellung je Seitentyp; liest den ganzen Index, daher nur für die Kommandozeile
+        with self._lock:
+            rows = self._db.execute("SELECT kind, COUNT(*), COUNT(DISTINCT digest), SUM(size), MIN(captured_at), "
+                                    "MAX(captured_at) FROM snapshots GROUP BY kind").fetchall()
+        return {kind: {"entries": entries, "objects": objects, "html_bytes": size, "first": first, "last": last}
+                for kind, entries, objects, size, first, last in rows}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        return {
+            "entries": entries,
+            "captured": self.captured,
+            "deduplicated": self.deduplicated,
+            "failures": self.failures,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store: Optional[SnapshotStore] = None
+
+
+def open_snapshot_store() -> Optional[SnapshotStore]:
+    global _store
+    if config.SNAPSHOTS and _store is None:
+        _store = SnapshotStore()
+    return _store
+
+
+def close_snapshot_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def snapshots_enabled() -> bool:
+    # Aufrufer holen das HTML (z.B. page.content()) nur, wenn es auch abgelegt wird
+    return _store is not None
+
+
+async def capture_snapshot(kind: str, url: str, html: str):
+    store = _store
+    if store is None or not html:
+        return
+    try:
+        await asyncio.to_thread(store.put, kind, url, html)
+    except Exception as e:
+        store.failures += 1
+        print(f"[WARNING] Could not store snapshot of {url}: {str(e)}")
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from utils import config
+from utils.responses import dumps
+
+
+class WatchStore:
+    """Persistente Ablage für Watches, den Index gesehener Anzeigen und die Event-Queue."""
+
+    def __init__(self, path: str = config.WATCH_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS watches (
+                id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                interval_seconds INTEGER NOT NULL,
+                max_pages INTEGER NOT NULL,
+                webhook_url TEXT,
+                emit_initial INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_run_at REAL,
+                next_run_at REAL NOT NULL,
+                last_error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS seen (
+                watch_id TEXT NOT NULL,
+                adid TEXT NOT NULL,
+                price TEXT,
+                PRIMARY KEY (watch_id, adid)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                watch_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                adid TEXT NOT NULL,
+                ad TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                delivered INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS events_watch ON events (watch_id, id);
+        """)
+        self._db.commit()
+
+    def _execute(self, fn):
+        with self._lock:
+            try:
+                result = fn(self._db)
+                self._db.commit()
+                return result
+            except Exception:
+                self._db.rollback()
+                raise
+
+    async def _run(self, fn):
+        return await asyncio.to_thread(self._execute, fn)
+
+    @staticmethod
+    def _watch_dict(row: sqlite3.Row) -> dict:
+        watch = dict(row)
+        watch["params"] = json.loads(watch["params"])
+        watch["emit_initial"] = bool(watch["emit_initial"])
+        return watch
+
+    async def create_watch(self, params: dict, interval_seconds: int, max_pages: int,
+                           webhook_url: Optional[str] = None, emit_initial: bool = False) -> dict:
+        watch_id = uuid.uuid4().hex
+        now = time.time()
+
+        def insert(db):
+            db.execute("INSERT INTO watches (id, params, interval_seconds, max_pages, webhook_url, emit_initial, "
+                       "created_at, next_run_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (watch_id, json.dumps(params), interval_seconds, max_pages, webhook_url, int(emit_initial),
+                        now, now))
+
+        await self._run(insert)
+        return await self.get_watch(watch_id)
+
+    async def get_watch(self, watch_id: str) -> Optional[dict]:
+        row = await self._run(lambda db: db.execute("SELECT * FROM watches WHERE id = ?", (watch_id,)).fetchone())
+        return self._watch_dict(row) if row else None
+
+    async def list_watches(self) -> List[dict]:
+        rows = await self._run(lambda db: db.execute("SELECT * FROM watches ORDER BY created_at").fetchall())
+        return [self._watch_dict(row) for row in rows]
+
+    async def due_watches(self, now: float) -> List[dict]:
+        rows = await self._run(lambda db: db.execute("SELECT * FROM watches WHERE next_run_at <= ?",
+                                                     (now,)).fetchall())
+        return [self._watch_dict(row) for row in rows]
+
+    async def delete_watch(self, watch_id: str) -> bool:
+        def delete(db):
+            deleted = db.execute("DELETE FROM watches WHERE id = ?", (watch_id,)).rowcount
+            db.execute("DELETE FROM seen WHERE watch_id = ?", (watch_id,))
+            db.execute("DELETE FROM events WHERE watch_id = ?", (watch_id,))
+            return deleted > 0
+
+        return await self._run(delete)
+
+    async def finish_run(self, watch_id: str, started_at: float, interval_seconds: int, error: Optional[str] = None):
+        await self._run(lambda db: db.execute(
+            "UPDATE watches SET last_run_at = ?, next_run_at = ?, last_error = ? WHERE id = ?",
+            (started_at, started_at + interval_seconds, error, watch_id)))
+
+    async def has_seen_any(self, watch_id: str) -> bool:
+        row = await self._run(lambda db: db.execute("SELECT 1 FROM seen WHERE watch_id = ? LIMIT 1",
+                                                    (watch_id,)).fetchone())
+        return row is not None
+
+    async def known_prices(self, watch_id: str, adids: List[str]) -> Dict[str, Optional[str]]:
+        def select(db):
+            placeholders = ",".join("?" * len(adids))
+            return db.execute(f"SELECT adid, price FROM seen WHERE watch_id = ? AND adid IN ({placeholders})",
+                              (watch_id, *adids)).fetchall()
+
+        return {row["adid"]: row["price"] for row in await self._run(select)} if adids else {}
+
+    async def record_ads(self, watch_id: str, ads: List[dict], events: List[dict]):
+        # Index und Events in einer Transaktion schreiben, damit kein Event verloren geht
+        now = time.time()
+
+        def write(db):
+            db.executemany("INSERT OR REPLACE INTO seen (watch_id, adid, price) VALUES (?, ?, ?)",
+                           [(watch_id, ad["adid"], ad.get("price")) for ad in ads])
+            db.executemany("INSERT INTO events (watch_id, type, adid, ad, created_at) VALUES (?, ?, ?, ?, ?)",
+                           [(watch_id, event["type"], event["ad"]["adid"], dumps(event["ad"]),
+                             now) for event in events])
+
+        await self._run(write)
+
+    async def events(self, watch_id: str, after: int = 0, limit: int = 100, undelivered: bool = False) -> List[dict]:
+        query = "SELECT * FROM events WHERE watch_id = ? AND id > ?"
+        if undelivered:
+            query += " AND delivered = 0"
+        query += " ORDER BY id LIMIT ?"
+        rows = await self._run(lambda db: db.execute(query, (watch_id, after, limit)).fetchall())
+        return [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "adid": row["adid"],
+                "ad": json.loads(row["ad"]),
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        ]
+
+    async def mark_delivered(self, event_ids: List[int]):
+        await self._run(lambda db: db.executemany("UPDATE events SET delivered = 1 WHERE id = ?",
+                                                  [(event_id,) for event_id in event_ids]))
+
+    async def prune_events(self, older_than: float):
+        await self._run(lambda db: db.execute("DELETE FROM events WHERE created_at < ?", (older_than,)))
+
+    async def close(self):
+        with self._lock:
+            self._db.close()